@@ -0,0 +1,66 @@
+"""
+Memory and throughput benchmark for the vector-heavy parts of the schema pipeline.
+
+Builds a layered VASS with many simple paths and a self-loop on every state, then measures
+the memory held by its linear path schemas and the speed of simulate_path over all of them.
+
+    python benchmarks/bench_vectors.py [--width W] [--layers L] [--repeat R]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.generate_lps import generate_linear_path_schemas
+from src.reachabilty_lps import simulate_path
+from src.utils import convert_json_to_vass
+
+
+def layered_config(width: int, layers: int, seed: int = 0) -> dict:
+    """
+    A VASS of 'layers' layers of 'width' states, with every state linked to every state of the next layer
+    and a self-loop on every state. It has width^(layers-2) simple paths from the first to the last state.
+    """
+    rng = random.Random(seed)
+    states = [0] + [1 + layer * width + i for layer in range(layers - 2) for i in range(width)] + [1 + (layers - 2) * width]
+    layer_states = [[0]] + [states[1 + layer * width:1 + (layer + 1) * width] for layer in range(layers - 2)] + [[states[-1]]]
+    vector = lambda: [rng.randint(-3, 3), rng.randint(-3, 3)]
+    transitions = [{"from": s, "to": s, "vector": vector()} for s in states]
+    for current, following in zip(layer_states, layer_states[1:]):
+        transitions += [{"from": s, "to": t, "vector": vector()} for s in current for t in following]
+    return {"states": states, "transitions": transitions, "initial_state": 0, "final_state": states[-1],
+            "initial_vector": [100, 100], "final_vector": [0, 0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--width', type=int, default=5)
+    parser.add_argument('--layers', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    config = layered_config(args.width, args.layers)
+    tracemalloc.start()
+    vass, start_state, end_state, start, _ = convert_json_to_vass(config)
+    n_transitions = len(config["transitions"])
+    schemas = generate_linear_path_schemas(vass, start_state, end_state, 2 * len(config["states"]) * n_transitions, n_transitions)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{len(schemas)} schemas with {sum(len(s.loops) for s in schemas)} loops")
+    print(f"memory held: {current / 2**20:.1f} MiB, peak while generating: {peak / 2**20:.1f} MiB")
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        for scheme in schemas:
+            simulate_path(start, scheme, [3] * len(scheme.loops), False)
+        best = min(best, time.perf_counter() - started)
+    print(f"simulate_path: {len(schemas) / best:,.0f} schemas/s (best of {args.repeat})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 from src.definition import *
-from src.generate_lps import generate_linear_path_schemas   
-from src.reachabilty_lps import is_reachable
-from src.utils import convert_json_to_vass
+from src.solver import load_config, solve, solve_targets
+from src.batch import run_batch
+from src.binary_model import convert_json_to_binary
 import argparse
 import json
 import sys
@@ -9,35 +9,61 @@ import os
 
 if __name__ == '__main__':
     
-    if '--config' not in sys.argv:
-        print("Error: --config argument is required")
+    if '--config' not in sys.argv and '--batch' not in sys.argv:
+        print("Error: --config or --batch argument is required")
         sys.exit(1)
 
     parser = argparse.ArgumentParser(description='Process some integers.')
     parser.add_argument('--config', type=str, help='Path to the config file')
+    parser.add_argument('--engine', choices=['auto', 'lps', 'bfs', 'bidir'], default='auto', help='Reachability engine: picked by the planner, linear path schemas, bounded breadth-first search or bounded bidirectional search')
+    parser.add_argument('--bound', type=int, nargs=2, metavar=('X', 'Y'), help='Upper bounds on the counters for the bfs and bidir engines')
+    parser.add_argument('--no-precheck', action='store_true', help='Skip the coverability pre-check')
+    parser.add_argument('--index', type=str, help='Semilinear index file for the start vector, built and saved if missing')
+    parser.add_argument('--explain', action='store_true', help='Print the engine chosen by the planner and why')
+    parser.add_argument('--witness', action='store_true', help='Print a run-length encoded run when the target is reachable')
+    parser.add_argument('--targets', type=str, metavar='PATH', help='JSON list of [x, y] targets to answer from the initial vector in one run, with the schemas and --index')
+    parser.add_argument('--to-binary', type=str, metavar='PATH', help='Convert the JSON config file to the binary model format and exit')
+    parser.add_argument('--batch', type=str, help='Directory or glob pattern of config files to run in parallel')
+    parser.add_argument('--journal', type=str, default='journal.jsonl', help='Batch journal (.csv or JSON lines); files already in it are skipped')
+    parser.add_argument('--workers', type=int, help='Number of batch worker processes (default: number of CPUs, at most one per file)')
+    parser.add_argument('--timeout', type=float, help='Per-file timeout in seconds for batch runs')
+    parser.add_argument('--retry-failed', action='store_true', help='Run again the batch files whose journal record is a timeout or an error')
 
     args = parser.parse_args()
+    bounds = tuple(args.bound) if args.bound else None
+
+    if args.batch:
+        run_batch(args.batch, args.journal, args.workers, args.timeout, args.engine, bounds, not args.no_precheck, args.retry_failed, args.witness)
+        sys.exit(0)
 
     if not os.path.isfile(args.config):
         print(f"Error: The file {args.config} does not exist")
         sys.exit(1)
 
-    with open(args.config, 'r') as file:
-        json_data = json.load(file)
-
+    if args.to_binary:
+        with open(args.config, 'r') as file:
+            convert_json_to_binary(json.load(file), args.to_binary)
+        sys.exit(0)
 
-    vass, start_state, end_state, start_vector, target_vector = convert_json_to_vass(json_data)
-    n_states = len(json_data["states"])
-    n_transitions = len(json_data["transitions"])
-    max_path_length = 2*n_states*n_transitions    # |p| <= 2*|U|*|E|
-    max_cycles = n_transitions                    # |p| <= |E|
+    vass, start_state, end_state, start_vector, target_vector = load_config(args.config)
 
-    lps_list = generate_linear_path_schemas(vass, start_state, end_state, max_path_length, max_cycles)
+    if args.targets:
+        # Many targets from one start: the index and the schemes are loaded once for all of them
+        with open(args.targets, 'r') as file:
+            targets = [intern_vector(x, y) for x, y in json.load(file)]
+        for result in solve_targets(vass, start_state, end_state, start_vector, targets, not args.no_precheck, args.index):
+            print(result.message)
+            if args.witness and result.witness:
+                print(result.witness)
+        sys.exit(0)
+    try:
+        result = solve(vass, start_state, end_state, start_vector, target_vector, args.engine, bounds, not args.no_precheck, args.index, args.witness)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
 
-    for lps in lps_list:
-        reachable, null_space = is_reachable(start_vector, target_vector, lps, False)
-        if reachable:
-            print(f"Target {target_vector} is reachable")
-            exit(0)
-    
-    print(f"Target {target_vector} is not reachable")
\ No newline at end of file
+    if args.explain:
+        print(result.explanation or f"Engine: {args.engine} (set with --engine)")
+    print(result.message)
+    if args.witness and result.witness:
+        print(result.witness)
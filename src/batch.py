@@ -0,0 +1,236 @@
+from src.solver import load_config, solve
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+import csv
+import glob
+import json
+import os
+import signal
+import time
+
+JOURNAL_FIELDS = ["file", "status", "reachable", "message", "witness", "load_seconds", "solve_seconds"]
+# Statuses that --retry-failed runs again
+FAILED_STATUSES = ("timeout", "error")
+
+
+def collect_configs(pattern: str) -> List[str]:
+    """
+    List the configuration files of a batch.
+
+    Args:
+        pattern (str): A directory, whose *.json files are taken, or a glob pattern.
+
+    Returns:
+        List[str]: The absolute paths of the files, sorted.
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.json")
+    return sorted(os.path.abspath(path) for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def read_journal(journal: str) -> Dict[str, dict]:
+    """
+    Read the records of a journal written by run_batch.
+
+    Args:
+        journal (str): Path to the journal, CSV if it ends in .csv and JSON lines otherwise.
+
+    Returns:
+        Dict[str, dict]: The last record per file. A missing journal is empty, and a line cut
+                         short by a crash is ignored.
+    """
+    records = {}
+    if not os.path.isfile(journal):
+        return records
+    with open(journal, 'r', newline='') as file:
+        if journal.endswith('.csv'):
+            rows = [row for row in csv.DictReader(file) if row.get("status")]
+        else:
+            rows = []
+            for line in file:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    for row in rows:
+        if row.get("file"):
+            records[row["file"]] = row
+    return records
+
+
+def append_journal(journal: str, record: dict):
+    """
+    Append one record to the journal and flush it to disk, so that it survives a crash.
+
+    Args:
+        journal (str): Path to the journal, CSV if it ends in .csv and JSON lines otherwise.
+        record (dict): The record, with the keys in JOURNAL_FIELDS.
+    """
+    new_file = not os.path.isfile(journal) or os.path.getsize(journal) == 0
+    # A crash may have cut the last line short; start on a fresh line so the new record stays readable
+    if not new_file:
+        with open(journal, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            cut_short = file.read(1) != b"\n"
+    with open(journal, 'a', newline='') as file:
+        if not new_file and cut_short:
+            file.write("\n")
+        if journal.endswith('.csv'):
+            writer = csv.DictWriter(file, fieldnames=JOURNAL_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(record)
+        else:
+            file.write(json.dumps(record) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError()
+
+
+def run_config(path: str, timeout: Optional[float] = None, engine: str = 'auto',
+               bounds: Optional[Tuple[int, int]] = None, precheck: bool = True, witness: bool = False) -> dict:
+    """
+    Solve one configuration file and describe the outcome as a journal record.
+
+    The timeout is enforced with SIGALRM inside the process running the file, so it needs a Unix platform.
+
+    Args:
+        path (str): Path to the configuration file.
+        timeout (Optional[float], optional): Seconds after which the file is given up. Defaults to no limit.
+        engine (str, optional): The engine passed on to solve. Defaults to 'auto', as in main.py.
+        bounds (Optional[Tuple[int, int]], optional): Counter bounds for the bfs engine.
+        precheck (bool, optional): Whether to run the coverability pre-check first. Defaults to True.
+        witness (bool, optional): Whether a witness is wanted, passed on to solve. Without it 'auto' may pick the
+                                  bfs engine, which gives none, so such records have witness None. Defaults to False.
+
+    Returns:
+        dict: The record, with status 'ok', 'timeout' or 'error'.
+    """
+    record = dict.fromkeys(JOURNAL_FIELDS)
+    record["file"] = path
+    if timeout:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    started = time.perf_counter()
+    try:
+        config = load_config(path)
+        loaded = time.perf_counter()
+        record["load_seconds"] = round(loaded - started, 6)
+        result = solve(*config, engine=engine, bounds=bounds, precheck=precheck, witness=witness)
+        record["solve_seconds"] = round(time.perf_counter() - loaded, 6)
+        record.update(status="ok", reachable=result.reachable, message=result.message, witness=result.witness)
+    except TimeoutError:
+        record.update(status="timeout", message=f"Timed out after {timeout} seconds")
+    except Exception as error:
+        record.update(status="error", message=f"{type(error).__name__}: {error}")
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return record
+
+
+def crashed_record(path: str) -> dict:
+    """
+    Describe a file whose worker process died (killed, out of memory, ...) as a journal record.
+    """
+    record = dict.fromkeys(JOURNAL_FIELDS)
+    record.update(file=path, status="error", message="BrokenProcessPool: the worker process died while running the file")
+    return record
+
+
+def run_pool(tasks: List[tuple], workers: int):
+    """
+    Run configurations over a process pool, yielding each record as soon as it is ready.
+
+    At most one task per worker is handed to the pool at a time, so when a worker dies the tasks that may have
+    killed it are exactly the unfinished ones. Those are run again one at a time, each in a fresh single-worker
+    pool: a file that kills that pool too is reported with crashed_record, the others get their normal record.
+    The remaining tasks then go on in a fresh pool.
+
+    Args:
+        tasks (List[tuple]): The arguments of run_config, one tuple per file.
+        workers (int): Number of worker processes.
+
+    Yields:
+        dict: The record of each file, in the order they finish.
+    """
+    queue = deque(tasks)
+    while queue:
+        suspects = []
+        with ProcessPoolExecutor(workers) as pool:
+            running = {}
+            while queue or running:
+                while queue and len(running) < workers:
+                    task = queue.popleft()
+                    running[pool.submit(run_config, *task)] = task
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        broken = True
+                        continue
+                    del running[future]
+                    yield future.result()
+                if broken:
+                    suspects = list(running.values())
+                    break
+
+        for task in suspects:
+            with ProcessPoolExecutor(1) as pool:
+                try:
+                    yield pool.submit(run_config, *task).result()
+                except BrokenProcessPool:
+                    yield crashed_record(task[0])
+
+
+def run_batch(pattern: str, journal: str, workers: Optional[int] = None, timeout: Optional[float] = None,
+              engine: str = 'auto', bounds: Optional[Tuple[int, int]] = None, precheck: bool = True,
+              retry_failed: bool = False, witness: bool = False, debug: bool = True) -> List[dict]:
+    """
+    Solve every configuration file of a batch over a process pool, appending each outcome to a journal.
+
+    Files that already have a record in the journal are skipped, so an interrupted batch resumes
+    where it stopped when it is run again with the same journal. A worker that dies does not stop the
+    batch: its file is recorded as an error and the pool is restarted (see run_pool).
+
+    Args:
+        pattern (str): A directory or glob pattern, as for collect_configs.
+        journal (str): Path to the journal, CSV if it ends in .csv and JSON lines otherwise.
+        workers (Optional[int], optional): Number of worker processes. Defaults to the number of CPUs, but no
+                                           more than there are files to run.
+        timeout (Optional[float], optional): Seconds after which a single file is given up. Defaults to no limit.
+        engine (str, optional): The engine passed on to solve. Defaults to 'auto', as in main.py.
+        bounds (Optional[Tuple[int, int]], optional): Counter bounds for the bfs engine.
+        precheck (bool, optional): Whether to run the coverability pre-check first. Defaults to True.
+        retry_failed (bool, optional): If True, files whose last record is a timeout or an error are run again
+                                       instead of skipped. Defaults to False.
+        witness (bool, optional): Whether every reachable record should carry a witness, see run_config. Defaults to False.
+        debug (bool, optional): If True, prints a line per finished file. Defaults to True.
+
+    Returns:
+        List[dict]: The records written by this run.
+    """
+    done = {path: record for path, record in read_journal(journal).items()
+            if not (retry_failed and record.get("status") in FAILED_STATUSES)}
+    pending = [path for path in collect_configs(pattern) if path not in done]
+    if debug:
+        print(f"{len(done)} files already in the journal, {len(pending)} to run")
+
+    records = []
+    if not pending:
+        return records
+    workers = workers or min(os.cpu_count() or 1, len(pending))
+    tasks = [(path, timeout, engine, bounds, precheck, witness) for path in pending]
+    for record in run_pool(tasks, workers):
+        append_journal(journal, record)
+        records.append(record)
+        if debug:
+            print(f"{record['file']}: {record['status']} {record['message']}")
+    return records
@@ -0,0 +1,158 @@
+from src.definition import *
+from collections.abc import Mapping
+import mmap
+import struct
+import numpy as np
+
+MAGIC = b"VAS2"
+VERSION = 1
+# magic, version, bytes per transition value (4 or 8), number of states, number of transitions,
+# initial state, final state, initial vector (x, y), final vector (x, y)
+HEADER = struct.Struct("<4sHHqqqqqqqq")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def convert_json_to_binary(json_data: dict, path: str):
+    """
+    Write a configuration in the binary model format.
+
+    After the header come, each starting on an 8-byte boundary, the sorted state ids and the offsets of
+    every state's transitions (both int64), then the from, to, dx and dy arrays of the transitions, sorted
+    by source state. The transition arrays are int32 when every value fits and int64 otherwise. Transitions
+    of a state keep their order from the JSON file.
+
+    Args:
+        json_data (dict): The JSON data containing states, transitions, and vectors.
+        path (str): The file to write.
+    """
+    known = set(json_data["states"])
+    state_ids = np.array(sorted(known), dtype=np.int64)
+    transitions = [t for t in json_data["transitions"] if t["from"] in known]
+    columns = np.array([[t["from"], t["to"], t["vector"][0], t["vector"][1]] for t in transitions], dtype=np.int64).reshape(-1, 4)
+    columns = columns[np.argsort(columns[:, 0], kind="stable")]
+
+    small = columns.size == 0 or (columns.min() >= np.iinfo(np.int32).min and columns.max() <= np.iinfo(np.int32).max)
+    dtype = np.int32 if small else np.int64
+    offsets = np.searchsorted(columns[:, 0], np.append(state_ids, np.iinfo(np.int64).max)).astype(np.int64)
+    offsets[-1] = len(columns)
+
+    header = HEADER.pack(MAGIC, VERSION, np.dtype(dtype).itemsize, len(state_ids), len(columns),
+                         json_data["initial_state"], json_data["final_state"],
+                         *json_data["initial_vector"], *json_data["final_vector"])
+    with open(path, "wb") as file:
+        file.write(header)
+        for array in [state_ids, offsets] + [columns[:, i].astype(dtype) for i in range(4)]:
+            file.write(b"\0" * (_align(file.tell()) - file.tell()))
+            file.write(array.tobytes())
+
+
+def is_binary_model(path: str) -> bool:
+    """
+    Check whether a file starts with the binary model magic bytes.
+    """
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class MappedStates(Mapping):
+    """
+    Read-only mapping from state ids to State objects, built on demand from a MappedVASS2D.
+    """
+
+    def __init__(self, vass: 'MappedVASS2D'):
+        self._vass = vass
+
+    def __getitem__(self, state_id: int) -> State:
+        if self._vass.position(state_id) is None:
+            raise KeyError(state_id)
+        return State(state_id, self._vass.get_transitions(state_id))
+
+    def __contains__(self, state_id) -> bool:
+        return self._vass.position(state_id) is not None
+
+    def __iter__(self):
+        return (int(state_id) for state_id in self._vass.state_ids)
+
+    def __len__(self) -> int:
+        return len(self._vass.state_ids)
+
+
+class MappedVASS2D(VASS2D):
+    """
+    A VASS2D whose transitions live in arrays, typically views into a memory-mapped binary model.
+
+    The arrays are never copied. The (target_state_id, vector) tuple of a state is built the first time
+    the state is asked for and cached, since the path and cycle searches ask for the same states many times.
+    """
+
+    def __init__(self, state_ids: np.ndarray, offsets: np.ndarray, sources: np.ndarray,
+                 targets: np.ndarray, dx: np.ndarray, dy: np.ndarray):
+        self.state_ids, self.offsets = state_ids, offsets
+        self.sources, self.targets, self.dx, self.dy = sources, targets, dx, dy
+        self._transitions = {}
+
+    @property
+    def states(self) -> MappedStates:
+        return MappedStates(self)
+
+    def position(self, state_id: int) -> Optional[int]:
+        """
+        Find the position of a state in the sorted state ids, or None if the state does not exist.
+        """
+        i = int(np.searchsorted(self.state_ids, state_id))
+        return i if i < len(self.state_ids) and self.state_ids[i] == state_id else None
+
+    def get_transitions(self, state_id: int) -> Tuple[Transition, ...]:
+        if state_id not in self._transitions:
+            i = self.position(state_id)
+            if i is None:
+                return ()
+            window = slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+            self._transitions[state_id] = tuple(Transition(int(target), intern_vector(x, y))
+                                                for target, x, y in zip(self.targets[window], self.dx[window], self.dy[window]))
+        return self._transitions[state_id]
+
+    def transition_count(self) -> int:
+        # Read off the arrays, so that no state is materialized
+        return len(self.targets)
+
+    def largest_step(self) -> int:
+        if not len(self.targets):
+            return 0
+        return max(max(abs(int(array.min())), abs(int(array.max()))) for array in (self.dx, self.dy))
+
+
+def load_binary_vass(path: str) -> Tuple[MappedVASS2D, int, int, Vector2D, Vector2D]:
+    """
+    Memory-map a binary model written by convert_json_to_binary.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        Tuple[MappedVASS2D, int, int, Vector2D, Vector2D]: The VASS, start state, end state, initial vector, and
+                                                          final vector, like convert_json_to_vass.
+
+    Raises:
+        ValueError: If the file is not a binary model of a supported version.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, itemsize, n_states, n_transitions, start_state, end_state, sx, sy, tx, ty = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a binary model of version {VERSION}")
+
+    dtype = np.int32 if itemsize == 4 else np.int64
+    arrays = []
+    offset = HEADER.size
+    for array_dtype, count in [(np.int64, n_states), (np.int64, n_states + 1)] + [(dtype, n_transitions)] * 4:
+        offset = _align(offset)
+        arrays.append(np.frombuffer(buffer, dtype=array_dtype, count=count, offset=offset))
+        offset += count * np.dtype(array_dtype).itemsize
+
+    vass = MappedVASS2D(*arrays)
+    vass.buffer = buffer  # keep the mapping alive as long as the views into it
+    return vass, start_state, end_state, Vector2D(sx, sy), Vector2D(tx, ty)
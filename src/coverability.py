@@ -0,0 +1,162 @@
+from src.definition import *
+from collections import deque
+from bisect import bisect_left, bisect_right
+
+# Node budgets of build_coverability_tree; plan_engine skips the pre-check when a state looks to need more
+MAX_NODES = 100000
+MAX_NODES_PER_STATE = 1000
+
+
+def add_omega(value: int, delta: int) -> int:
+    """
+    Add a transition component to a counter value, leaving OMEGA unchanged.
+    """
+    return value if value == OMEGA else value + delta
+
+
+class Antichain:
+    """
+    The maximal counter values seen in one state, kept sorted by x. As no point covers another, y then
+    strictly decreases, so checking whether a point is covered and inserting one are binary searches.
+    """
+
+    def __init__(self):
+        self.xs = []
+        self.neg_ys = []  # -y, so that it increases along the list like xs
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def covers(self, x: int, y: int) -> bool:
+        """
+        Check whether some point of the antichain is at least (x, y) in both counters.
+        """
+        # The first point with at least x has the largest y among all such points
+        i = bisect_left(self.xs, x)
+        return i < len(self.xs) and -self.neg_ys[i] >= y
+
+    def add(self, x: int, y: int):
+        """
+        Insert a point that is not covered, dropping the points it covers.
+        """
+        high = bisect_right(self.xs, x)           # points with at most x
+        low = bisect_left(self.neg_ys, -y, 0, high)  # of those, the points with at most y
+        self.xs[low:high] = [x]
+        self.neg_ys[low:high] = [-y]
+
+
+def build_coverability_tree(vass: VASS2D, start_state: int, start: Vector2D,
+                            max_nodes: int = MAX_NODES, max_nodes_per_state: int = MAX_NODES_PER_STATE,
+                            debug: bool = True) -> CoverabilityTree:
+    """
+    Build a Karp-Miller coverability tree of the VASS from the given configuration.
+
+    A new node that strictly covers one of its ancestors in the same state gets every growing
+    counter accelerated to OMEGA. A new node that is covered by any node already in the tree
+    with the same state is pruned, since everything it reaches is covered from that node. Only the
+    maximal nodes of each state are compared against, kept in an Antichain.
+
+    The tree can grow large without any acceleration, e.g. when loops only move value between the
+    counters, so the construction also gives up once a single state has max_nodes_per_state nodes.
+    The pre-check is meant to be cheap; an incomplete tree is simply not used.
+
+    Args:
+        vass (VASS2D): The VASS to explore.
+        start_state (int): The initial state.
+        start (Vector2D): The initial counter values.
+        max_nodes (int, optional): The construction stops and marks the tree incomplete once it holds this many nodes. Defaults to MAX_NODES.
+        max_nodes_per_state (int, optional): Likewise for the nodes of a single state. Defaults to MAX_NODES_PER_STATE.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        CoverabilityTree: The nodes of the tree.
+    """
+    tree = CoverabilityTree(array('q', [start_state]), array('q', [start.x]), array('q', [start.y]), array('q', [-1]))
+    by_state = {start_state: Antichain()}  # maximal counters per state, for the subsumption check
+    by_state[start_state].add(start.x, start.y)
+    per_state = {start_state: 1}
+    queue = deque([0])
+
+    while queue:
+        node = queue.popleft()
+        state, x, y = tree.states[node], tree.xs[node], tree.ys[node]
+        for next_state, vector in vass.get_transitions(state):
+            new_x = add_omega(x, vector.x)
+            new_y = add_omega(y, vector.y)
+            if new_x < 0 or new_y < 0:
+                continue
+
+            # Accelerate against every ancestor in the same state that the new node strictly covers
+            ancestor = node
+            while ancestor != -1:
+                if tree.states[ancestor] == next_state:
+                    old_x, old_y = tree.xs[ancestor], tree.ys[ancestor]
+                    if old_x <= new_x and old_y <= new_y and (old_x, old_y) != (new_x, new_y):
+                        if old_x < new_x:
+                            new_x = OMEGA
+                        if old_y < new_y:
+                            new_y = OMEGA
+                ancestor = tree.parents[ancestor]
+
+            maximal = by_state.setdefault(next_state, Antichain())
+            if maximal.covers(new_x, new_y):
+                continue
+
+            if len(tree.states) >= max_nodes or per_state.get(next_state, 0) >= max_nodes_per_state:
+                if debug:
+                    print(f"Coverability tree reached the limit of {max_nodes} nodes, or {max_nodes_per_state} in state {next_state}")
+                tree.complete = False
+                return tree
+
+            maximal.add(new_x, new_y)
+            per_state[next_state] = per_state.get(next_state, 0) + 1
+            queue.append(len(tree.states))
+            tree.states.append(next_state)
+            tree.xs.append(new_x)
+            tree.ys.append(new_y)
+            tree.parents.append(node)
+            if debug:
+                print(f"Node {len(tree.states) - 1}: state {next_state}, counters ({format_counter(new_x)}, {format_counter(new_y)})")
+
+    return tree
+
+
+def format_counter(value: int) -> str:
+    """
+    Render a counter value, with OMEGA shown as 'w'.
+    """
+    return "w" if value == OMEGA else str(value)
+
+
+def is_coverable(tree: CoverabilityTree, state: int, target: Vector2D) -> bool:
+    """
+    Check whether some configuration in the given state with counters at least target is reachable.
+
+    Args:
+        tree (CoverabilityTree): A complete coverability tree.
+        state (int): The state to cover.
+        target (Vector2D): The counter values to cover.
+
+    Returns:
+        bool: True if a node of the tree in that state covers the target.
+    """
+    return any(tree.states[i] == state and tree.xs[i] >= target.x and tree.ys[i] >= target.y
+               for i in range(len(tree.states)))
+
+
+def state_upper_bounds(tree: CoverabilityTree) -> Dict[int, Tuple[Optional[int], Optional[int]]]:
+    """
+    Compute, per state, upper bounds on the counter values of every reachable configuration.
+
+    Args:
+        tree (CoverabilityTree): A complete coverability tree.
+
+    Returns:
+        Dict[int, Tuple[Optional[int], Optional[int]]]: The largest x and y per state, None if the counter is unbounded.
+                                                        States that are not reachable are left out.
+    """
+    bounds = {}
+    for state, x, y in zip(tree.states, tree.xs, tree.ys):
+        max_x, max_y = bounds.get(state, (0, 0))
+        bounds[state] = (max(max_x, x), max(max_y, y))
+    return {state: (None if x == OMEGA else x, None if y == OMEGA else y) for state, (x, y) in bounds.items()}
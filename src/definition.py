@@ -1,7 +1,26 @@
-from dataclasses import dataclass
-from typing import List, Set, Dict, Tuple, Optional
+from array import array
+from dataclasses import dataclass, field, fields
+from typing import List, Set, Dict, Tuple, Optional, NamedTuple
 
-@dataclass
+def _add_slots(cls):
+    """
+    Rebuild a dataclass with __slots__ for its fields, as dataclass(slots=True) does on Python 3.10 and later.
+    Pickling goes through __getstate__ and __setstate__, since frozen instances refuse plain attribute assignment.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items() if key not in names + ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    namespace['__getstate__'] = lambda self: tuple(getattr(self, name) for name in names)
+    def __setstate__(self, state):
+        for name, value in zip(names, state):
+            object.__setattr__(self, name, value)
+    namespace['__setstate__'] = __setstate__
+    slotted = type(cls)(cls.__name__, cls.__bases__, namespace)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
+@_add_slots
+@dataclass(frozen=True)
 class Vector2D:
     x: int
     y: int
@@ -16,13 +35,62 @@ class Vector2D:
         return f"({self.x}, {self.y})"
     
     def __eq__(self, other: 'Vector2D') -> bool:
+        if not isinstance(other, Vector2D):
+            return NotImplemented
         return self.x == other.x and self.y == other.y
 
+    def __hash__(self) -> int:
+        return hash((self.x, self.y))
+
+_INTERNED: Dict[Tuple[int, int], Vector2D] = {}
+
+def intern_vector(x: int, y: int) -> Vector2D:
+    """
+    Return the shared Vector2D for (x, y), creating it on first use. Vectors are immutable, so the
+    transition vectors of a model and the loop effects built from them can all share one object per value.
+    """
+    key = (int(x), int(y))
+    vector = _INTERNED.get(key)
+    if vector is None:
+        vector = _INTERNED[key] = Vector2D(*key)
+    return vector
+
+ZERO = intern_vector(0, 0)
+
+@_add_slots
 @dataclass
+class Accumulator:
+    # A mutable running sum of vectors, for hot loops that would otherwise allocate a new Vector2D on every addition
+    x: int = 0
+    y: int = 0
+
+    def add(self, vector: Vector2D, times: int = 1) -> 'Accumulator':
+        self.x += vector.x * times
+        self.y += vector.y * times
+        return self
+
+    def is_negative(self) -> bool:
+        return self.x < 0 or self.y < 0
+
+    def vector(self) -> Vector2D:
+        return Vector2D(self.x, self.y)
+
+    def __str__(self):
+        return f"({self.x}, {self.y})"
+
+@_add_slots
+@dataclass(frozen=True)
 class Loop:
     # 'effect' represents the net change caused by the Loop, and 'guard' specifies the minimum state vector values required to execute the loop
     effect: Vector2D
     guard: Tuple[int, int]
+    # 'cycle' holds the (from_state, to_state, vector) transitions of the underlying state cycle, used to rebuild concrete runs
+    cycle: Optional[Tuple[Tuple[int, int, Vector2D], ...]] = field(default=None, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'guard', tuple(self.guard))
+        if self.cycle is not None:
+            object.__setattr__(self, 'cycle', tuple(self.cycle))
 
 @dataclass
 class LinearPathScheme:
@@ -31,6 +99,7 @@ class LinearPathScheme:
     loops: List[Loop]
     between_vectors: List[List[Vector2D]]  # List of vector lists between each loop
     suffix_vectors: List[Vector2D]  
+    path: Optional[List[int]] = None  # The simple path of states the scheme was generated from
 
     def __eq__(self, other):
         if not isinstance(other, LinearPathScheme):
@@ -38,14 +107,53 @@ class LinearPathScheme:
         return self.prefix_vectors == other.prefix_vectors and self.loops == other.loops and self.between_vectors == other.between_vectors and self.suffix_vectors == other.suffix_vectors
 
 @dataclass
+class WitnessSegment:
+    # A run-length encoded piece of a run: 'transitions' are (from_state, to_state, vector) triples executed 'count' times in a row
+    transitions: List[Tuple[int, int, Vector2D]]
+    count: int = 1
+
+OMEGA = 2**63 - 1  # Counter value of an unbounded (omega) coordinate, the largest value an int64 array can hold
+
+@dataclass
+class CoverabilityTree:
+    # Nodes are stored column-wise in compact int64 arrays: node i is (states[i], xs[i], ys[i]) with parent parents[i] (-1 for the root).
+    # A counter value of OMEGA stands for an unbounded counter, and 'complete' is False if the construction stopped at its node limit
+    states: array
+    xs: array
+    ys: array
+    parents: array
+    complete: bool = True
+
+class Transition(NamedTuple):
+    target: int
+    vector: Vector2D
+
+@_add_slots
+@dataclass(frozen=True)
 class State:
     id: int
-    transitions: List[Tuple[int, Vector2D]]  # (target_state_id, vector)
+    transitions: Tuple[Transition, ...]  # (target_state_id, vector); any iterable of pairs is converted on construction
+
+    def __post_init__(self):
+        object.__setattr__(self, 'transitions', tuple(Transition(*transition) for transition in self.transitions))
 
 @dataclass
 class VASS2D:
     # A dictionary mapping state IDs to their corresponding State objects, which include transition information
     states: Dict[int, State]
     
-    def get_transitions(self, state_id: int) -> List[Tuple[int, Vector2D]]:
-        return self.states[state_id].transitions if state_id in self.states else []
+    def get_transitions(self, state_id: int) -> Tuple[Transition, ...]:
+        return self.states[state_id].transitions if state_id in self.states else ()
+
+    def transition_count(self) -> int:
+        """
+        Count the transitions of all states.
+        """
+        return sum(len(state.transitions) for state in self.states.values())
+
+    def largest_step(self) -> int:
+        """
+        Find the largest absolute change of a single counter by one transition, or 0 without transitions.
+        """
+        return max((max(abs(vector.x), abs(vector.y)) for state in self.states.values() for _, vector in state.transitions),
+                   default=0)
@@ -19,12 +19,15 @@ def generate_linear_path_schemas(vass: VASS2D, start: int, end: int,
     """
     schemas = []
     simple_paths = find_simple_paths(vass,start,end,max_path_length) # list all the paths starting from starting state to ending state
+    cycles_by_state = {}  # Loops are immutable, so every path through a state shares its loops
 
     for path in simple_paths:
         all_cycles = []  # List of (position, cycle) tuples
 
         for state_idx, state in enumerate(path):
-            cycles = find_cycles(vass,state)
+            if state not in cycles_by_state:
+                cycles_by_state[state] = find_cycles(vass,state)
+            cycles = cycles_by_state[state]
             for cycle in cycles:
                     all_cycles.append((state_idx, cycle))
 
@@ -41,7 +44,8 @@ def generate_linear_path_schemas(vass: VASS2D, start: int, end: int,
                 prefix_vectors=prefix_vectors,
                 loops=[],
                 between_vectors=[],
-                suffix_vectors=[]
+                suffix_vectors=[],
+                path=path
             )
             schemas.append(schema)
             continue
@@ -99,7 +103,8 @@ def generate_linear_path_schemas(vass: VASS2D, start: int, end: int,
             prefix_vectors=prefix_vectors,
             loops=loops,
             between_vectors=between_vectors,
-            suffix_vectors=suffix_vectors
+            suffix_vectors=suffix_vectors,
+            path=path
         )
         schemas.append(schema)
         
@@ -0,0 +1,359 @@
+from src.definition import *
+from src.reachability_bfs import default_bounds, MAX_BITMAP_CELLS
+from src.coverability import MAX_NODES_PER_STATE
+import random
+import numpy as np
+
+# Rough cost of the basic step of each engine, in seconds, used to compare their estimated work
+# (SECONDS_PER_CELL and SECONDS_PER_SHIFT measured with bfs_search on the layered models of benchmarks/bench_vectors.py)
+SECONDS_PER_CANDIDATE = 2e-5     # one coefficient combination tried by generate_solution_candidates
+SECONDS_PER_CELL = 5e-10         # one cell of a state's bitmap shifted along one transition in a search step
+SECONDS_PER_SHIFT = 5e-6         # fixed cost of one such shift, which dominates for small boxes
+# Largest number of tree nodes counted exactly before falling back to sampling, and the number of samples
+EXACT_NODE_BUDGET = 10000
+SAMPLES = 200
+MAX_EXPONENT = 100
+
+
+@dataclass
+class Plan:
+    # 'engine' is 'lps' or 'bfs', 'precheck' whether the coverability pre-check is worth running first;
+    # 'closed' means the box holds every reachable configuration, so that a negative answer of the search is exact
+    engine: str
+    bounds: Optional[Tuple[int, int]]
+    precheck: bool
+    closed: bool = False
+    estimates: Dict[str, float] = field(default_factory=dict)
+    reasons: List[str] = field(default_factory=list)
+
+
+def reachable_states(vass: VASS2D, start: int, reverse: bool = False) -> Set[int]:
+    """
+    Collect the states reachable from a state in the control graph, ignoring the counters.
+
+    Args:
+        vass (VASS2D): The VASS whose control graph is searched.
+        start (int): The state to start from.
+        reverse (bool, optional): If True, follow the transitions backwards. Defaults to False.
+
+    Returns:
+        Set[int]: The states reached, including the start.
+    """
+    if reverse:
+        predecessors = {}
+        for state_id in vass.states:
+            for next_state, _ in vass.get_transitions(state_id):
+                predecessors.setdefault(next_state, set()).add(state_id)
+        successors = lambda state_id: predecessors.get(state_id, ())
+    else:
+        successors = lambda state_id: (next_state for next_state, _ in vass.get_transitions(state_id))
+
+    seen = {start}
+    stack = [start]
+    while stack:
+        for next_state in successors(stack.pop()):
+            if next_state not in seen:
+                seen.add(next_state)
+                stack.append(next_state)
+    return seen
+
+
+def strongly_connected_components(vass: VASS2D, states: Set[int]) -> Dict[int, int]:
+    """
+    Number the strongly connected components of the control graph restricted to some states (Tarjan, iteratively).
+
+    Args:
+        vass (VASS2D): The VASS whose control graph is split.
+        states (Set[int]): The states to keep; transitions leaving them are ignored.
+
+    Returns:
+        Dict[int, int]: The component number of every kept state.
+    """
+    index, low, component = {}, {}, {}
+    stack, on_stack = [], set()
+    counter = 0
+    for root in states:
+        if root in index:
+            continue
+        work = [(root, iter(vass.get_transitions(root)))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            state_id, transitions = work[-1]
+            for next_state, _ in transitions:
+                if next_state not in states:
+                    continue
+                if next_state not in index:
+                    index[next_state] = low[next_state] = counter
+                    counter += 1
+                    stack.append(next_state)
+                    on_stack.add(next_state)
+                    work.append((next_state, iter(vass.get_transitions(next_state))))
+                    break
+                if next_state in on_stack:
+                    low[state_id] = min(low[state_id], index[next_state])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[state_id])
+                if low[state_id] == index[state_id]:
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component[member] = index[state_id]
+                        if member == state_id:
+                            break
+    return component
+
+
+def estimate_tree(expand, root, rng: random.Random, budget: int = EXACT_NODE_BUDGET, samples: int = SAMPLES) -> Tuple[np.ndarray, bool]:
+    """
+    Sum a value over the nodes of a search tree, exactly if the tree is small and by sampling otherwise.
+
+    The tree is walked depth-first until the budget of nodes runs out. Past that, Knuth's estimator is used:
+    random root-to-leaf walks, where the value of every node on a walk is weighted by the product of the
+    branching factors above it. Its mean over the walks is an unbiased estimate of the sum.
+
+    Args:
+        expand: Function from a node to its value (an array) and the list of its children.
+        root: The root node.
+        rng (random.Random): Source of the random walks.
+        budget (int, optional): Number of nodes counted exactly before sampling. Defaults to EXACT_NODE_BUDGET.
+        samples (int, optional): Number of random walks. Defaults to SAMPLES.
+
+    Returns:
+        Tuple[np.ndarray, bool]: The (estimated) sum, and whether it is exact.
+    """
+    total = 0
+    stack = [root]
+    nodes = 0
+    while stack:
+        nodes += 1
+        if nodes > budget:
+            break
+        value, children = expand(stack.pop())
+        total = total + value
+        stack.extend(children)
+    else:
+        return np.asarray(total, dtype=float), True
+
+    total = 0
+    for _ in range(samples):
+        weight, node = 1, root
+        while True:
+            value, children = expand(node)
+            total = total + weight * value
+            if not children:
+                break
+            weight *= len(children)
+            node = rng.choice(children)
+    return np.asarray(total, dtype=float) / samples, False
+
+
+def count_cycles(vass: VASS2D, state: int, component: Dict[int, int], rng: random.Random) -> Tuple[float, bool]:
+    """
+    Count the loops find_cycles would return for a state: its self-loops plus the simple cycles through it.
+
+    Only states in the same strongly connected component are explored, since no cycle leaves it.
+
+    Returns:
+        Tuple[float, bool]: The (estimated) number of loops, and whether it is exact.
+    """
+    def expand(node):
+        current, visited = node
+        closing, children = 0, []
+        for next_state, _ in vass.get_transitions(current):
+            if next_state == state:
+                closing += 1
+            elif next_state not in visited and component.get(next_state) == component[state]:
+                children.append((next_state, visited | {next_state}))
+        return closing, children
+
+    total, exact = estimate_tree(expand, (state, frozenset([state])), rng)
+    return float(total), exact
+
+
+def estimate_precheck_nodes(vass: VASS2D, start: Vector2D) -> int:
+    """
+    Roughly guess how many nodes the coverability tree of the pre-check needs in a single state.
+
+    A node covered by another of its state is pruned and a node growing past an ancestor is accelerated to
+    OMEGA, so the tree only grows wide when transitions move value from one counter to the other: each move
+    gives a node that neither covers nor is covered by the others. Moving the start values across, one
+    smallest transfer at a time, takes about this many nodes. Values raised later in the run are not counted.
+
+    Args:
+        vass (VASS2D): The VASS to analyze.
+        start (Vector2D): The initial counter values.
+
+    Returns:
+        int: The guessed number of nodes per state.
+    """
+    # smallest amount a transfer takes from x (into y) and from y (into x)
+    steps = [None, None]
+    for state_id in vass.states:
+        for _, vector in vass.get_transitions(state_id):
+            for counter, (taken, given) in enumerate([(vector.x, vector.y), (vector.y, vector.x)]):
+                if taken < 0 < given:
+                    steps[counter] = -taken if steps[counter] is None else min(steps[counter], -taken)
+
+    nodes = 1
+    for value, step in zip((start.x, start.y), steps):
+        if step is not None:
+            nodes += value // step
+    return nodes
+
+
+def plan_engine(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start: Vector2D,
+    target: Vector2D,
+    bounds: Optional[Tuple[int, int]] = None,
+    precheck: bool = True,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None,
+    seed: int = 0,
+    witness: bool = False,
+    index: bool = False
+) -> Plan:
+    """
+    Estimate, from the control graph alone, the work of the schema pipeline and of the bounded search, and pick the cheaper.
+
+    The schema pipeline builds one schema per simple path from the start to the end state, with one loop per
+    cycle through each of its states, and tries 11^(k-2) coefficient combinations for a schema with k loops.
+    The number of paths, the loops per state and the combinations are counted exactly on small graphs and
+    sampled on large ones. The bounded search shifts a state's bitmap along every transition in each step, for
+    at most about as many steps as the box is wide and high. The bidirectional search is not considered: its steps
+    cost about the same, and it returns no bitmap of the configurations seen for solve to check a negative answer.
+    Nor is the number of workers, which is up to the batch runner since a plan covers a single configuration.
+    The pick is only a guess: solve checks the answer of the search and falls back to the schemas when the
+    guess cannot be trusted. A witness or a semilinear index only comes from the schemas, so asking for either
+    picks them.
+
+    The plan also decides whether the coverability pre-check runs first: it is skipped when
+    estimate_precheck_nodes exceeds the per-state budget of the tree, which would then stop incomplete and
+    answer nothing. solve runs the pre-check if the plan says so, and plans again with the counter bounds it
+    finds, passed as state_bounds.
+
+    Args:
+        vass (VASS2D): The VASS to analyze.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start (Vector2D): The initial counter values.
+        target (Vector2D): The target counter values.
+        bounds (Optional[Tuple[int, int]], optional): Box for the bounded search. Defaults to the counter bounds
+                                                      of the pre-check if they are all finite, else default_bounds.
+        precheck (bool, optional): Whether the coverability pre-check may run. Defaults to True.
+        state_bounds (Optional[Dict], optional): Counter bounds per state from a complete coverability tree, if the
+                                                 pre-check already ran.
+        seed (int, optional): Seed of the sampling, so that the plan is reproducible. Defaults to 0.
+        witness (bool, optional): Whether a witness run is asked for. Defaults to False.
+        index (bool, optional): Whether a semilinear index is to be used. Defaults to False.
+
+    Returns:
+        Plan: The chosen engine and parameters, the estimates and the reasons.
+    """
+    rng = random.Random(seed)
+    reasons = []
+
+    if state_bounds is not None:
+        run_precheck = True
+        reasons.append("the coverability pre-check ran, did not refute the target and bounds the counters per state")
+    elif not precheck:
+        run_precheck = False
+        reasons.append("the coverability pre-check is disabled")
+    else:
+        tree_nodes = estimate_precheck_nodes(vass, start)
+        run_precheck = tree_nodes <= MAX_NODES_PER_STATE
+        if run_precheck:
+            reasons.append(f"the coverability pre-check runs first (~{tree_nodes} tree nodes per state): "
+                           f"it refutes uncoverable targets and bounds the counters")
+        else:
+            reasons.append(f"the coverability pre-check is skipped: moving the start values {start} between the counters "
+                           f"takes ~{tree_nodes} tree nodes per state, over its budget of {MAX_NODES_PER_STATE}")
+    relevant = reachable_states(vass, start_state) & reachable_states(vass, end_state, reverse=True)
+    component = strongly_connected_components(vass, relevant)
+
+    loops = {}
+    loops_exact = True
+    for state_id in relevant:
+        loops[state_id], exact = count_cycles(vass, state_id, component, rng)
+        loops_exact = loops_exact and exact
+
+    def expand(node):
+        # value: paths, loops summed over paths, coefficient combinations summed over paths
+        current, visited = node
+        if current == end_state:
+            k = sum(loops[state_id] for state_id in visited)
+            # capped so that the sum stays finite; the schemas are hopeless long before that
+            return np.array([1.0, k, 11.0 ** min(max(k - 2, 0), MAX_EXPONENT)]), []
+        children = [(next_state, visited | {next_state}) for next_state, _ in vass.get_transitions(current)
+                    if next_state != current and next_state not in visited and next_state in relevant]
+        return np.zeros(3), children
+
+    if start_state in relevant:
+        (paths, loop_total, candidates), paths_exact = estimate_tree(expand, (start_state, frozenset([start_state])), rng)
+    else:
+        (paths, loop_total, candidates), paths_exact = (0.0, 0.0, 0.0), True
+    exact = loops_exact and paths_exact
+
+    largest = vass.largest_step()
+    n_transitions = vass.transition_count()
+
+    closed = False
+    if bounds is None and state_bounds and all(None not in pair for pair in state_bounds.values()):
+        bounds = (max(x for x, _ in state_bounds.values()), max(y for _, y in state_bounds.values()))
+        closed = True
+        reasons.append(f"the pre-check bounds every counter, so the box {bounds} holds every reachable configuration")
+    bounds = bounds or default_bounds(vass, start, target)
+    cells = len(vass.states) * (bounds[0] + 1) * (bounds[1] + 1)
+
+    lps_seconds = max(candidates, paths) * SECONDS_PER_CANDIDATE
+    # Each search step shifts a state's bitmap along every transition and merges one per state; a run inside
+    # the box takes at most about bounds[0] + bounds[1] steps before it stops finding new configurations
+    shifts = n_transitions + len(vass.states)
+    step_seconds = shifts * ((bounds[0] + 1) * (bounds[1] + 1) * SECONDS_PER_CELL + SECONDS_PER_SHIFT)
+    bfs_seconds = step_seconds * (bounds[0] + bounds[1] + 1)
+    estimates = {
+        "simple_paths": paths,
+        "loops_per_schema": loop_total / paths if paths else 0.0,
+        "candidates": candidates,
+        "largest_vector": largest,
+        "box_cells": cells,
+        "lps_seconds": lps_seconds,
+        "bfs_seconds": bfs_seconds,
+    }
+    reasons.append(f"{'exact' if exact else 'sampled'} counts: {paths:.3g} simple paths, "
+                   f"{estimates['loops_per_schema']:.3g} loops per schema, {candidates:.3g} coefficient combinations")
+    reasons.append(f"largest vector component {largest}, box {bounds} with {cells} cells over {len(vass.states)} states")
+
+    if cells > MAX_BITMAP_CELLS:
+        engine = 'lps'
+        reasons.append(f"the box is larger than {MAX_BITMAP_CELLS} cells, so the bounded search cannot run")
+    elif bfs_seconds < lps_seconds:
+        engine = 'bfs'
+        reasons.append(f"the bounded search (~{bfs_seconds:.2g}s) looks cheaper than the schemas (~{lps_seconds:.2g}s)")
+    else:
+        engine = 'lps'
+        reasons.append(f"the schemas (~{lps_seconds:.2g}s) look cheaper than the bounded search (~{bfs_seconds:.2g}s)")
+
+    if engine == 'bfs' and (witness or index):
+        engine = 'lps'
+        asked = "a witness" if witness else "the semilinear index"
+        reasons.append(f"{asked} was asked for, which only the schemas give, so they are used instead")
+
+    return Plan(engine, bounds if engine == 'bfs' else None, run_precheck, closed and engine == 'bfs', estimates, reasons)
+
+
+def format_plan(plan: Plan) -> str:
+    """
+    Describe a plan for --explain, one reason per line.
+    """
+    parameters = f"bounds {plan.bounds}, " if plan.bounds else ""
+    lines = [f"Engine: {plan.engine} ({parameters}pre-check {'on' if plan.precheck else 'off'})"]
+    lines += [f"  - {reason}" for reason in plan.reasons]
+    return "\n".join(lines)
@@ -0,0 +1,200 @@
+from src.definition import *
+import numpy as np
+
+MAX_BITMAP_CELLS = 2**30  # Largest number of (state, x, y) cells a bounded search may allocate per bitmap set
+
+
+def shift_bitmap(bitmap: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    """
+    Shift a 2D bitmap of counter values by a vector, dropping every cell that leaves the box.
+
+    Args:
+        bitmap (np.ndarray): Boolean array where bitmap[x, y] marks the counter values (x, y).
+        dx (int): Shift along the x axis.
+        dy (int): Shift along the y axis.
+
+    Returns:
+        np.ndarray: A new bitmap of the same shape. Cells shifted below zero or past the bounds are masked out.
+    """
+    width, height = bitmap.shape
+    shifted = np.zeros_like(bitmap)
+    if abs(dx) >= width or abs(dy) >= height:
+        return shifted
+    src_x = slice(max(0, -dx), width - max(0, dx))
+    dst_x = slice(max(0, dx), width - max(0, -dx))
+    src_y = slice(max(0, -dy), height - max(0, dy))
+    dst_y = slice(max(0, dy), height - max(0, -dy))
+    shifted[dst_x, dst_y] = bitmap[src_x, src_y]
+    return shifted
+
+
+def default_bounds(vass: VASS2D, start: Vector2D, target: Vector2D) -> Tuple[int, int]:
+    """
+    Pick a search box when none is given: the larger of the start and target values, plus room
+    for every state to be passed once with the largest transition vector.
+
+    Args:
+        vass (VASS2D): The VASS to be searched.
+        start (Vector2D): The starting counter values.
+        target (Vector2D): The target counter values.
+
+    Returns:
+        Tuple[int, int]: The inclusive upper bounds for x and y.
+    """
+    slack = vass.largest_step() * len(vass.states)
+    return max(start.x, target.x) + slack, max(start.y, target.y) + slack
+
+
+def expand_frontier(vass: VASS2D, frontier: Dict[int, np.ndarray], visited: Dict[int, np.ndarray]) -> Dict[int, np.ndarray]:
+    """
+    Take one step from every configuration in the frontier and keep the configurations not seen before.
+
+    Args:
+        vass (VASS2D): The VASS whose transitions are taken.
+        frontier (Dict[int, np.ndarray]): Bitmap of the configurations to expand, per state.
+        visited (Dict[int, np.ndarray]): Bitmap of all configurations seen so far, per state. Updated in place.
+
+    Returns:
+        Dict[int, np.ndarray]: The new frontier, per state.
+    """
+    reached = {state_id: np.zeros_like(bitmap) for state_id, bitmap in visited.items()}
+    for state_id, bitmap in frontier.items():
+        if not bitmap.any():
+            continue
+        for next_state, vector in vass.get_transitions(state_id):
+            reached[next_state] |= shift_bitmap(bitmap, vector.x, vector.y)
+
+    for state_id, bitmap in reached.items():
+        bitmap &= ~visited[state_id]
+        visited[state_id] |= bitmap
+    return reached
+
+
+def empty_bitmaps(vass: VASS2D, bounds: Tuple[int, int]) -> Dict[int, np.ndarray]:
+    """
+    Allocate one empty bitmap per state, including states that only appear as transition targets.
+
+    Args:
+        vass (VASS2D): The VASS to allocate bitmaps for.
+        bounds (Tuple[int, int]): The inclusive upper bounds for x and y.
+
+    Returns:
+        Dict[int, np.ndarray]: An all-False bitmap of shape (bounds[0] + 1, bounds[1] + 1) per state.
+
+    Raises:
+        ValueError: If the bitmaps would hold more than MAX_BITMAP_CELLS cells.
+    """
+    state_ids = set(vass.states)
+    for state_id in vass.states:
+        state_ids.update(next_state for next_state, _ in vass.get_transitions(state_id))
+    cells = (bounds[0] + 1) * (bounds[1] + 1) * len(state_ids)
+    if cells > MAX_BITMAP_CELLS:
+        raise ValueError(f"The box {bounds} needs {cells} bitmap cells, more than the limit of {MAX_BITMAP_CELLS}")
+    return {state_id: np.zeros((bounds[0] + 1, bounds[1] + 1), dtype=bool) for state_id in state_ids}
+
+
+def in_bounds(vector: Vector2D, bounds: Tuple[int, int]) -> bool:
+    """
+    Check whether counter values lie inside the box [0, bounds[0]] x [0, bounds[1]].
+    """
+    return 0 <= vector.x <= bounds[0] and 0 <= vector.y <= bounds[1]
+
+
+def escapes_box(vass: VASS2D, visited: Dict[int, np.ndarray], bounds: Tuple[int, int]) -> bool:
+    """
+    Check whether some configuration in the bitmaps has a transition that leaves the box through its upper bounds.
+
+    If it has none, the bitmaps of a finished search hold every reachable configuration, not just
+    those inside the box. The check is conservative: a transition that would also drop below zero
+    still counts as leaving the box.
+
+    Args:
+        vass (VASS2D): The VASS that was searched.
+        visited (Dict[int, np.ndarray]): Bitmap of the configurations seen, per state.
+        bounds (Tuple[int, int]): The inclusive upper bounds for x and y.
+
+    Returns:
+        bool: True if the box may cut off some run.
+    """
+    width, height = bounds[0] + 1, bounds[1] + 1
+    for state_id, bitmap in visited.items():
+        for _, vector in vass.get_transitions(state_id):
+            if vector.x > 0 and bitmap[max(0, width - vector.x):, max(0, -vector.y):].any():
+                return True
+            if vector.y > 0 and bitmap[max(0, -vector.x):, max(0, height - vector.y):].any():
+                return True
+    return False
+
+
+def bfs_search(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start: Vector2D,
+    target: Vector2D,
+    bounds: Tuple[int, int],
+    debug: bool = True
+) -> Tuple[bool, Optional[int], Optional[Dict[int, np.ndarray]]]:
+    """
+    Run the search of bfs_reachable and also return the bitmaps of the configurations it saw.
+
+    Returns:
+        Tuple[bool, Optional[int], Optional[Dict[int, np.ndarray]]]: As bfs_reachable, followed by the
+            visited bitmaps per state (None if the start or target lies outside the box).
+    """
+    if not in_bounds(start, bounds) or not in_bounds(target, bounds):
+        if debug:
+            print(f"Start {start} or target {target} lies outside the box {bounds}")
+        return False, None, None
+
+    visited = empty_bitmaps(vass, bounds)
+    if start_state not in visited or end_state not in visited:
+        return False, None, visited
+    visited[start_state][start.x, start.y] = True
+    if start_state == end_state and start == target:
+        return True, 0, visited
+
+    frontier = {start_state: visited[start_state].copy()}
+    steps = 0
+    while True:
+        frontier = expand_frontier(vass, frontier, visited)
+        steps += 1
+        size = sum(int(np.count_nonzero(bitmap)) for bitmap in frontier.values())
+        if debug:
+            print(f"Step {steps}: {size} new configurations")
+        if frontier[end_state][target.x, target.y]:
+            return True, steps, visited
+        if size == 0:
+            return False, None, visited
+
+
+def bfs_reachable(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start: Vector2D,
+    target: Vector2D,
+    bounds: Tuple[int, int],
+    debug: bool = True
+) -> Tuple[bool, Optional[int]]:
+    """
+    Decide reachability by an explicit breadth-first search over the configurations inside a box.
+
+    Each state keeps a bitmap of the counter values seen in it, and a whole frontier is moved along a
+    transition at once by shifting its bitmap by the transition vector. A positive answer is exact.
+    A negative answer only means that no run stays inside [0, bounds[0]] x [0, bounds[1]].
+
+    Args:
+        vass (VASS2D): The VASS to search.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start (Vector2D): The initial counter values.
+        target (Vector2D): The target counter values.
+        bounds (Tuple[int, int]): The inclusive upper bounds for x and y.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        Tuple[bool, Optional[int]]: Whether the target is reachable inside the box, and if so the length of a shortest run.
+    """
+    reachable, steps, _ = bfs_search(vass, start_state, end_state, start, target, bounds, debug)
+    return reachable, steps
@@ -0,0 +1,106 @@
+from src.definition import *
+from src.reachability_bfs import expand_frontier, empty_bitmaps, in_bounds
+import numpy as np
+
+
+def reverse_vass(vass: VASS2D) -> VASS2D:
+    """
+    Build the reversed VASS, in which every transition is flipped and its vector negated.
+
+    A run of the reversed VASS from (q, v) to (p, u) is exactly a run of the original VASS from (p, u)
+    to (q, v) read backwards, and both stay non-negative in the same configurations.
+
+    Args:
+        vass (VASS2D): The VASS to reverse.
+
+    Returns:
+        VASS2D: The reversed VASS, with a state for every state or transition target of the original.
+    """
+    transitions = {state_id: [] for state_id in vass.states}
+    for state_id in vass.states:
+        for next_state, vector in vass.get_transitions(state_id):
+            transitions.setdefault(next_state, []).append((state_id, intern_vector(-vector.x, -vector.y)))
+    return VASS2D({state_id: State(state_id, reversed_transitions) for state_id, reversed_transitions in transitions.items()})
+
+
+def frontier_size(frontier: Dict[int, np.ndarray]) -> int:
+    """
+    Count the configurations in a frontier.
+    """
+    return sum(int(np.count_nonzero(bitmap)) for bitmap in frontier.values())
+
+
+def meets(frontier: Dict[int, np.ndarray], visited: Dict[int, np.ndarray]) -> bool:
+    """
+    Check whether a frontier shares a configuration with the configurations seen by the other search.
+    """
+    return any(np.any(bitmap & visited[state_id]) for state_id, bitmap in frontier.items())
+
+
+def bidirectional_reachable(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start: Vector2D,
+    target: Vector2D,
+    bounds: Tuple[int, int],
+    debug: bool = True
+) -> Tuple[bool, Optional[int]]:
+    """
+    Decide reachability by searching forward from the start and backward from the target until the two meet.
+
+    Both searches keep one bitmap of seen counter values per state, as in bfs_reachable; the backward search
+    runs forward on the reversed VASS. Each round expands the side with the smaller frontier, so a search that
+    fans out quickly waits for the other one. If either side runs out of new configurations before they meet,
+    no run stays inside the box. As with bfs_reachable, a positive answer is exact and a negative one only
+    holds within [0, bounds[0]] x [0, bounds[1]].
+
+    Args:
+        vass (VASS2D): The VASS to search.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start (Vector2D): The initial counter values.
+        target (Vector2D): The target counter values.
+        bounds (Tuple[int, int]): The inclusive upper bounds for x and y.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        Tuple[bool, Optional[int]]: Whether the target is reachable inside the box, and if so the sum of the forward
+                                    and backward depths at which the searches met (an upper bound on the length of
+                                    a shortest run).
+    """
+    if not in_bounds(start, bounds) or not in_bounds(target, bounds):
+        if debug:
+            print(f"Start {start} or target {target} lies outside the box {bounds}")
+        return False, None
+
+    reversed_vass = reverse_vass(vass)
+    forward_visited = empty_bitmaps(vass, bounds)
+    backward_visited = empty_bitmaps(vass, bounds)
+    if start_state not in forward_visited or end_state not in backward_visited:
+        return False, None
+    forward_visited[start_state][start.x, start.y] = True
+    backward_visited[end_state][target.x, target.y] = True
+    if start_state == end_state and start == target:
+        return True, 0
+
+    forward = {start_state: forward_visited[start_state].copy()}
+    backward = {end_state: backward_visited[end_state].copy()}
+    forward_size = backward_size = 1
+    forward_depth = backward_depth = 0
+    while forward_size > 0 and backward_size > 0:
+        if forward_size <= backward_size:
+            forward = expand_frontier(vass, forward, forward_visited)
+            forward_depth += 1
+            forward_size = frontier_size(forward)
+            found = meets(forward, backward_visited)
+        else:
+            backward = expand_frontier(reversed_vass, backward, backward_visited)
+            backward_depth += 1
+            backward_size = frontier_size(backward)
+            found = meets(backward, forward_visited)
+        if debug:
+            print(f"Depths {forward_depth}/{backward_depth}: frontiers of {forward_size}/{backward_size} configurations")
+        if found:
+            return True, forward_depth + backward_depth
+    return False, None
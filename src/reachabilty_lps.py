@@ -1,7 +1,7 @@
 from src.definition import *
 from scipy.optimize import nnls
 from scipy import linalg
-from src.utils import sum_vectors, apply_vectors
+from src.utils import sum_vectors, apply_vectors_in_place
 import numpy as np
 
 
@@ -38,7 +38,8 @@ def generate_solution_candidates(
     particular_solution: np.ndarray,
     basis_vectors: np.ndarray,
     max_coefficient: int = 5,
-    debug: bool = True
+    debug: bool = True,
+    upper_bounds: Optional[np.ndarray] = None
 ) -> List[np.ndarray]:
     """
     Generate integer solution candidates by exploring the solution space.
@@ -48,14 +49,19 @@ def generate_solution_candidates(
         basis_vectors: Basis vectors spanning the solution space
         max_coefficient: Maximum absolute value for coefficients when exploring basis combinations
         debug: Whether to print debug information
+        upper_bounds: Optional upper bound for each component of a solution (np.inf if unbounded). Candidates
+                      exceeding it are dropped, and for a one-dimensional solution space the coefficient range
+                      is narrowed to the values that can respect it
     
     Returns:
         List of candidate integer solutions
     """
     solutions = []
+    if upper_bounds is None:
+        upper_bounds = np.full_like(particular_solution, np.inf)
     
     rounded_particular = np.round(particular_solution)
-    if np.all(rounded_particular >= 0):
+    if np.all(rounded_particular >= 0) and np.all(rounded_particular <= upper_bounds):
         solutions.append(rounded_particular)
     
     if basis_vectors.size == 0:
@@ -63,6 +69,8 @@ def generate_solution_candidates(
     
     coefficients = np.arange(-max_coefficient, max_coefficient + 1)
     num_basis = basis_vectors.shape[1]
+    if num_basis == 1:
+        coefficients = narrow_coefficients(particular_solution, basis_vectors[:, 0], upper_bounds, coefficients)
     
     # For each combination of coefficients
     from itertools import product
@@ -78,8 +86,8 @@ def generate_solution_candidates(
         # Round to integers and check validity
         candidate_int = np.round(candidate)
         
-        # Check if all components are non-negative
-        if np.all(candidate_int >= 0):
+        # Check if all components are non-negative and within the bounds
+        if np.all(candidate_int >= 0) and np.all(candidate_int <= upper_bounds):
             solutions.append(candidate_int)
             
             if debug:
@@ -88,7 +96,253 @@ def generate_solution_candidates(
     return solutions
 
 
-def simulate_path(current: Vector2D, scheme: LinearPathScheme, iterations: List[int], debug: bool = True) -> Tuple[bool, Optional[Vector2D]]:
+def narrow_coefficients(particular_solution: np.ndarray, direction: np.ndarray, upper_bounds: np.ndarray,
+                        coefficients: np.ndarray) -> np.ndarray:
+    """
+    Keep only the coefficients c for which particular_solution + c * direction can round into [0, upper_bounds].
+
+    Args:
+        particular_solution: A particular solution to Ax = b
+        direction: The single basis vector of the solution space
+        upper_bounds: Upper bound for each component of a solution (np.inf if unbounded)
+        coefficients: The coefficients to narrow down
+
+    Returns:
+        The coefficients inside the feasible interval
+    """
+    low, high = -np.inf, np.inf
+    for p, d, u in zip(particular_solution, direction, upper_bounds):
+        if abs(d) < 1e-12:
+            continue
+        # Components may round up from -0.5 and down from u + 0.5
+        ends = ((-0.5 - p) / d, (u + 0.5 - p) / d)
+        low, high = max(low, min(ends)), min(high, max(ends))
+    return coefficients[(coefficients >= low) & (coefficients <= high)]
+
+
+def loop_iteration_bounds(scheme: LinearPathScheme, state_bounds: Dict[int, Tuple[Optional[int], Optional[int]]]) -> np.ndarray:
+    """
+    Bound how often each loop of a scheme can be taken, given upper bounds on the counters per state.
+
+    A loop starting and ending in a state whose x counter never exceeds B can change x by at most B in
+    total, so it runs at most B // |effect.x| times (and likewise for y).
+
+    Args:
+        scheme (LinearPathScheme): The scheme whose loops are bounded. Loops without a cycle are left unbounded.
+        state_bounds (Dict[int, Tuple[Optional[int], Optional[int]]]): Upper bounds on x and y per reachable state,
+                                                                      None if unbounded, as from state_upper_bounds.
+
+    Returns:
+        np.ndarray: The largest iteration count per loop, np.inf if unbounded.
+    """
+    limits = np.full(len(scheme.loops), np.inf)
+    for i, loop in enumerate(scheme.loops):
+        if loop.cycle is None:
+            continue
+        state = loop.cycle[0][0]
+        if state not in state_bounds:
+            limits[i] = 0
+            continue
+        for bound, delta in zip(state_bounds[state], (loop.effect.x, loop.effect.y)):
+            if bound is not None and delta != 0:
+                limits[i] = min(limits[i], bound // abs(delta))
+    return limits
+
+
+def scheme_system(start: Vector2D, target: Vector2D, scheme: LinearPathScheme) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the linear system A x = b whose non-negative integer solutions x are the candidate loop counts of a scheme.
+
+    Args:
+        start (Vector2D): The starting position.
+        target (Vector2D): The target position.
+        scheme (LinearPathScheme): The scheme, with at least one loop.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The 2 x k matrix of loop effects and the change the loops must make.
+    """
+    # Prefix, between and suffix vectors are applied regardless of the loops
+    fixed = Accumulator(start.x, start.y)
+    for vec in scheme.prefix_vectors:
+        fixed.add(vec)
+    for vectors in scheme.between_vectors:
+        fixed.add(sum_vectors(vectors))
+    fixed.add(sum_vectors(scheme.suffix_vectors))
+
+    A = np.array([[loop.effect.x for loop in scheme.loops], [loop.effect.y for loop in scheme.loops]], dtype=float)
+    b = np.array([target.x - fixed.x, target.y - fixed.y], dtype=float)
+    return A, b
+
+
+def _cross(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def cone_feasible(A: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Decide for a stack of 2 x k systems whether A x = b has a real solution x >= 0.
+
+    In two dimensions b is a non-negative combination of the columns if and only if it is one of a single column
+    or of two linearly independent columns (Caratheodory), and both cases are checked in closed form. Systems
+    that fail cannot have a non-negative integer solution either, so their schemes need no candidate search.
+
+    Args:
+        A (np.ndarray): The matrices, of shape (n, 2, k).
+        b (np.ndarray): The right-hand sides, of shape (n, 2).
+
+    Returns:
+        np.ndarray: A boolean array of shape (n,).
+    """
+    columns = np.swapaxes(A, 1, 2)                        # (n, k, 2)
+    rhs = b[:, None, :]
+    feasible = np.all(b == 0, axis=1)
+    feasible |= np.any((_cross(columns, rhs) == 0) & (np.sum(columns * rhs, axis=2) > 0), axis=1)
+
+    first, second = np.triu_indices(A.shape[2], 1)
+    if len(first):
+        u, v = columns[:, first], columns[:, second]      # (n, pairs, 2)
+        det = _cross(u, v)
+        independent = det != 0
+        safe = np.where(independent, det, 1)
+        s = _cross(rhs, v) / safe
+        t = _cross(u, rhs) / safe
+        feasible |= np.any(independent & (s >= 0) & (t >= 0), axis=1)
+    return feasible
+
+
+def batch_nnls(A: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Solve a stack of 2 x k non-negative least squares problems, giving the same solutions as nnls.
+
+    Lawson and Hanson's active-set method, as used by nnls, adds the column with the largest gradient A^T (b - Ax)
+    one at a time. With two rows it stops after at most two columns, unless a two-column solution has a
+    non-positive entry, so the first two steps are taken for the whole stack at once in closed form. Systems where
+    that is not enough, or where the choice of column is a tie that nnls may break either way, go to nnls itself.
+
+    Args:
+        A (np.ndarray): The matrices, of shape (n, 2, k).
+        b (np.ndarray): The right-hand sides, of shape (n, 2).
+
+    Returns:
+        np.ndarray: The solutions, of shape (n, k).
+    """
+    n, _, k = A.shape
+    rows = np.arange(n)
+    x = np.zeros((n, k))
+    columns = np.swapaxes(A, 1, 2)
+
+    # Step 1: the column with the largest gradient, scaled to the least squares fit
+    w = np.einsum('nik,ni->nk', A, b)
+    # Gradients closer than this are treated as equal, relative to their size
+    tolerance = 1e-9 * np.maximum(np.abs(w).max(axis=1), 1)
+
+    def top_is_tied(w):
+        if w.shape[1] < 2:
+            return np.zeros(len(w), dtype=bool)
+        top = np.partition(w, -2, axis=1)
+        return top[:, -1] - top[:, -2] <= tolerance
+
+    active = w.max(axis=1) > 0
+    fallback = active & top_is_tied(w)
+    j = np.argmax(w, axis=1)
+    first = columns[rows, j]
+    x[rows, j] = np.where(active, np.sum(first * b, axis=1) / np.maximum(np.sum(first * first, axis=1), 1e-300), 0)
+
+    # Step 2: if some other column still decreases the residual, solve for both columns exactly
+    residual = b - first * x[rows, j][:, None]
+    w = np.einsum('nik,ni->nk', A, residual)
+    w[rows, j] = -np.inf
+    second_step = active & ~fallback & (w.max(axis=1) > tolerance)
+    fallback |= second_step & top_is_tied(w)
+    second_step &= ~fallback
+    i = np.argmax(w, axis=1)
+    second = columns[rows, i]
+    det = _cross(first, second)
+    safe = np.where(det != 0, det, 1)
+    s = _cross(b, second) / safe
+    t = _cross(first, b) / safe
+    fallback |= second_step & ((det == 0) | (s <= 0) | (t <= 0))
+    second_step &= ~fallback
+    x[second_step] = 0
+    x[rows[second_step], j[second_step]] = s[second_step]
+    x[rows[second_step], i[second_step]] = t[second_step]
+
+    for row in np.flatnonzero(fallback):
+        x[row] = nnls(A[row], b[row])[0]
+    return x
+
+
+def batch_null_spaces(A: np.ndarray) -> List[np.ndarray]:
+    """
+    Compute the null space bases of a stack of matrices with one batched SVD, as linalg.null_space does for each.
+
+    Args:
+        A (np.ndarray): The matrices, of shape (n, 2, k).
+
+    Returns:
+        List[np.ndarray]: The k x (k - rank) orthonormal basis of every matrix.
+    """
+    _, singular_values, vh = np.linalg.svd(A, full_matrices=True)
+    tolerance = np.amax(singular_values, axis=1, initial=0.) * np.finfo(float).eps * max(A.shape[1:])
+    ranks = np.sum(singular_values > tolerance[:, None], axis=1)
+    return [vh[row, rank:, :].T.conj() for row, rank in enumerate(ranks)]
+
+
+def batch_solution_spaces(
+    start: Vector2D,
+    target: Vector2D,
+    schemes: List[LinearPathScheme],
+    debug: bool = True
+) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Compute the solution spaces of many schemes at once, grouping the schemes by their number of loops.
+
+    The systems of a group are stacked into 3-D arrays, the schemes without a non-negative real solution are
+    dropped with cone_feasible, and the particular solutions and null spaces of the rest come from batch_nnls and
+    batch_null_spaces. They equal what find_solution_space_basis gives for each scheme, so is_reachable reaches
+    the same verdicts.
+
+    Args:
+        start (Vector2D): The starting position.
+        target (Vector2D): The target position.
+        schemes (List[LinearPathScheme]): The schemes.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        List[Optional[Tuple[np.ndarray, np.ndarray]]]: Per scheme, its particular solution and null space basis
+            (both empty for a scheme without loops), or None if it cannot reach the target.
+    """
+    spaces = [None] * len(schemes)
+    groups = {}
+    for index, scheme in enumerate(schemes):
+        if scheme.loops:
+            groups.setdefault(len(scheme.loops), []).append(index)
+        else:
+            spaces[index] = (np.zeros(0), np.zeros((0, 0)))
+
+    for k, indices in groups.items():
+        systems = [scheme_system(start, target, schemes[index]) for index in indices]
+        A = np.stack([system[0] for system in systems])
+        b = np.stack([system[1] for system in systems])
+        feasible = cone_feasible(A, b)
+        if debug:
+            print(f"{len(indices)} schemes with {k} loops, {int(feasible.sum())} with a non-negative solution")
+        if not feasible.any():
+            continue
+        particular = batch_nnls(A[feasible], b[feasible])
+        null_spaces = batch_null_spaces(A[feasible])
+        for index, p, null_space in zip(np.asarray(indices)[feasible], particular, null_spaces):
+            spaces[index] = (p, null_space)
+    return spaces
+
+
+def simulate_path(
+    current: Vector2D,
+    scheme: LinearPathScheme,
+    iterations: List[int],
+    debug: bool = True,
+    after_prefix: bool = False
+) -> Tuple[bool, Optional[Vector2D]]:
     """
     Simulates the path of a vector through a series of transformations defined by a LinearPathScheme.
     Args:
@@ -96,21 +350,25 @@ def simulate_path(current: Vector2D, scheme: LinearPathScheme, iterations: List[
         scheme (LinearPathScheme): The scheme defining the transformations, including prefix, between, and suffix vectors, as well as loop effects and guards.
         iterations (List[int]): A list of integers where each integer represents the number of times to apply the corresponding loop in the scheme.
         debug (bool, optional): If True, prints debug information during the simulation. Defaults to True.
+        after_prefix (bool, optional): If True, current is the position after the prefix vectors, already checked
+                                       to stay non-negative, and the prefix is not applied again. Defaults to False.
     Returns:
         Tuple[bool, Optional[Vector2D]]: A tuple where the first element is a boolean indicating whether the simulation was successful, and the second element is the final position of the vector if the simulation was successful, otherwise None.
     """
 
-    pos = current
+    # One mutable position is carried through the whole scheme instead of a new Vector2D per step
+    pos = Accumulator(current.x, current.y)
     
     if debug:
         print(f"Simulating from position: {pos}")
-        print(f"Applying prefix vectors")
     
     # Apply prefix vectors
     
-    valid, pos = apply_vectors(pos, scheme.prefix_vectors, debug)
-    if not valid:
-        return False, None
+    if not after_prefix:
+        if debug:
+            print(f"Applying prefix vectors")
+        if not apply_vectors_in_place(pos, scheme.prefix_vectors, debug):
+            return False, None
     
     # Apply each loop and its between vectors
     for i, count in enumerate(iterations):
@@ -118,25 +376,26 @@ def simulate_path(current: Vector2D, scheme: LinearPathScheme, iterations: List[
         if i > 0 and i - 1 < len(scheme.between_vectors):
             if debug:
                 print(f"Applying vectors between loop {i-1} and {i}")
-            valid, pos = apply_vectors(pos, scheme.between_vectors[i - 1], debug)
-            if not valid:
+            if not apply_vectors_in_place(pos, scheme.between_vectors[i - 1], debug):
                 return False, None
         
         if count > 0:  # Only check guard and apply loop if we're actually using it
-            # Check guard before loop execution
-            if pos.x < scheme.loops[i].guard[0] or pos.y < scheme.loops[i].guard[1]:
+            # Check guard before the first and the last iteration: the counters change linearly in between,
+            # so a decreasing loop that passes both passes every iteration
+            guard, effect = scheme.loops[i].guard, scheme.loops[i].effect
+            last_x, last_y = pos.x + effect.x * (count - 1), pos.y + effect.y * (count - 1)
+            if min(pos.x, last_x) < guard[0] or min(pos.y, last_y) < guard[1]:
                 if debug:
-                    print(f"Failed guard check at loop {i}: pos={pos}, guard={scheme.loops[i].guard}")
+                    print(f"Failed guard check at loop {i}: pos={pos}, guard={guard}, count={count}")
                 return False, None
                 
             # Apply loop effect
-            effect = scheme.loops[i].effect * count
-            pos = pos + effect
+            pos.add(scheme.loops[i].effect, count)
             
             if debug:
                 print(f"After loop {i} ({count} times): {pos}")
                 
-            if pos.x < 0 or pos.y < 0:
+            if pos.is_negative():
                 if debug:
                     print(f"Negative coordinates after loop {i}: {pos}")
                 return False, None
@@ -145,24 +404,25 @@ def simulate_path(current: Vector2D, scheme: LinearPathScheme, iterations: List[
     if len(iterations) > 0 and len(iterations) - 1 < len(scheme.between_vectors):
         if debug:
             print(f"Applying vectors between loop {len(iterations)-1} and {len(iterations)}")
-        valid, pos = apply_vectors(pos, scheme.between_vectors[len(iterations) - 1], debug)
-        if not valid:
+        if not apply_vectors_in_place(pos, scheme.between_vectors[len(iterations) - 1], debug):
             return False, None
     
     # Apply suffix vectors
     if debug:
         print(f"Applying suffix vectors")
-    valid, pos = apply_vectors(pos, scheme.suffix_vectors, debug)
-    if not valid:
+    if not apply_vectors_in_place(pos, scheme.suffix_vectors, debug):
         return False, None
     
-    return True, pos
+    return True, pos.vector()
 
 def is_reachable(
     start: Vector2D,
     target: Vector2D,
     scheme: LinearPathScheme,
-    debug: bool = True
+    debug: bool = True,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None,
+    solution_space: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    after_prefix: Optional[Vector2D] = None
 ) -> Tuple[bool, Optional[List[int]]]:
     
     """
@@ -172,55 +432,38 @@ def is_reachable(
         target (Vector2D): The target position.
         scheme (LinearPathScheme): The scheme defining the path with prefix, between, and suffix vectors, as well as loops.
         debug (bool, optional): If True, prints debug information. Defaults to True.
+        state_bounds (Optional[Dict], optional): Upper bounds on the counters per reachable state, as from
+                                                 state_upper_bounds, used to narrow the candidate search. Defaults to None.
+        solution_space (Optional[Tuple[np.ndarray, np.ndarray]], optional): The particular solution and null space basis
+                                                 of the scheme's system, as from batch_solution_spaces, instead of
+                                                 computing them here. Defaults to None.
+        after_prefix (Optional[Vector2D], optional): The position after the prefix vectors, already checked to stay
+                                                 non-negative, as cached by trie_candidates. Every candidate is then
+                                                 simulated from it instead of from start. Defaults to None.
     Returns:
         Tuple[bool, Optional[List[int]]]: A tuple where the first element is a boolean indicating if the target is reachable,
                                         and the second element is a list of integers representing the number of iterations
                                         for each loop in the scheme if reachable, otherwise None.
     """
-    current = start
     if debug:
         print(f"\nTesting reachability from {start} to {target}")
     
-    # Apply prefix vectors
-    for vec in scheme.prefix_vectors:
-        current = current + vec
-        if debug:
-            print(f"After prefix vector: {current}")
-    
-    # All between vectors will be applied regardless of loops
-    total_between_effect = Vector2D(0, 0)
-    for vectors in scheme.between_vectors:
-        total_between_effect = total_between_effect + sum_vectors(vectors)
-    
-    # Calculate total effect of suffix vectors
-    suffix_effect = sum_vectors(scheme.suffix_vectors)
-    
-    # Add the total fixed effect from between vectors to current position
-    current = current + total_between_effect
-    
+    if after_prefix is None:
+        simulate_from, skip_prefix = start, False
+    else:
+        simulate_from, skip_prefix = after_prefix, True
+
     num_loops = len(scheme.loops)
     if num_loops == 0:
         if debug:
             print("No loops in scheme")
-        valid, final_pos = simulate_path(start,scheme,[],debug)
+        valid, final_pos = simulate_path(simulate_from, scheme, [], debug, skip_prefix)
         if valid and final_pos == target:
             return True,None
         else:
             return False, None
 
-        
-    A = np.zeros((2, num_loops))
-    
-    # Build coefficient matrix
-    for i, loop in enumerate(scheme.loops):
-        A[0][i] = loop.effect.x
-        A[1][i] = loop.effect.y
-    
-    # Target vector 
-    b = np.array([
-        target.x - current.x - suffix_effect.x,
-        target.y - current.y - suffix_effect.y
-    ])
+    A, b = scheme_system(start, target, scheme)
 
     if debug:
         print(f"Matrix A shape: {A.shape}")
@@ -229,10 +472,14 @@ def is_reachable(
         print(f"Vector b: {b}")
     
     try:
-        particular_solution, solution_basis = find_solution_space_basis(A, b, debug)
+        if solution_space is None:
+            particular_solution, solution_basis = find_solution_space_basis(A, b, debug)
+        else:
+            particular_solution, solution_basis = solution_space
         
         # Generate candidate solutions
-        candidates = generate_solution_candidates(particular_solution, solution_basis, debug=debug)
+        upper_bounds = loop_iteration_bounds(scheme, state_bounds) if state_bounds is not None else None
+        candidates = generate_solution_candidates(particular_solution, solution_basis, debug=debug, upper_bounds=upper_bounds)
         
         # Test each candidate
         for candidate in candidates:
@@ -240,7 +487,7 @@ def is_reachable(
             if debug:
                 print(f"Testing candidate solution: {iterations}")
             
-            valid, final_pos = simulate_path(start, scheme, iterations, debug)
+            valid, final_pos = simulate_path(simulate_from, scheme, iterations, debug, skip_prefix)
             
             if valid and final_pos == target:
                 return True, iterations
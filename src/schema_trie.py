@@ -0,0 +1,172 @@
+from src.definition import *
+from src.reachabilty_lps import is_reachable, batch_solution_spaces
+from src.witness import segment_profile
+from typing import Callable
+
+
+@dataclass
+class SchemaTrieNode:
+    # A node stands for a shared beginning of schemes: prefix vectors, then alternating loops and vector segments.
+    # 'fixed_effect' is the sum of all vectors up to and including this node, 'guard' the minimum counters
+    # needed before this node's vectors, and 'increases'/'decreases' tell whether any loop so far can raise
+    # or lower x and y. 'schemes' are the schemes that end at this node
+    key: Optional[tuple] = None
+    children: Dict[tuple, 'SchemaTrieNode'] = field(default_factory=dict)
+    schemes: List[LinearPathScheme] = field(default_factory=list)
+    fixed_effect: Vector2D = field(default_factory=lambda: Vector2D(0, 0))
+    guard: Tuple[int, int] = (0, 0)
+    increases: Tuple[bool, bool] = (False, False)
+    decreases: Tuple[bool, bool] = (False, False)
+
+
+def scheme_keys(scheme: LinearPathScheme) -> List[tuple]:
+    """
+    Split a scheme into the sequence of trie keys it is stored under.
+
+    Args:
+        scheme (LinearPathScheme): The scheme to split.
+
+    Returns:
+        List[tuple]: A ('segment', vectors) key for the prefix, then a ('loop', effect, guard) key per loop,
+                     with the between vectors and finally the suffix vectors as segment keys in between.
+    """
+    def segment(vectors: List[Vector2D]) -> tuple:
+        return ('segment', tuple((vector.x, vector.y) for vector in vectors))
+
+    keys = [segment(scheme.prefix_vectors)]
+    for i, loop in enumerate(scheme.loops):
+        if i > 0:
+            keys.append(segment(scheme.between_vectors[i - 1]))
+        keys.append(('loop', (loop.effect.x, loop.effect.y), tuple(loop.guard)))
+    if scheme.loops:
+        keys.append(segment(scheme.suffix_vectors))
+    return keys
+
+
+def build_schema_trie(schemes: List[LinearPathScheme]) -> SchemaTrieNode:
+    """
+    Store schemes in a trie so that schemes with the same beginning share its nodes.
+
+    Args:
+        schemes (List[LinearPathScheme]): The schemes to store.
+
+    Returns:
+        SchemaTrieNode: The root of the trie.
+    """
+    root = SchemaTrieNode()
+    for scheme in schemes:
+        node = root
+        for key in scheme_keys(scheme):
+            if key not in node.children:
+                child = SchemaTrieNode(key=key, increases=node.increases, decreases=node.decreases)
+                if key[0] == 'segment':
+                    effect, child.guard = segment_profile([(0, 0, Vector2D(*vector)) for vector in key[1]])
+                    child.fixed_effect = node.fixed_effect + effect
+                else:
+                    dx, dy = key[1]
+                    child.fixed_effect = node.fixed_effect
+                    child.increases = (node.increases[0] or dx > 0, node.increases[1] or dy > 0)
+                    child.decreases = (node.decreases[0] or dx < 0, node.decreases[1] or dy < 0)
+                node.children[key] = child
+            node = node.children[key]
+        node.schemes.append(scheme)
+    return root
+
+
+def count_trie_nodes(node: SchemaTrieNode) -> int:
+    """
+    Count the nodes of a trie, including its root.
+    """
+    return 1 + sum(count_trie_nodes(child) for child in node.children.values())
+
+
+def trie_candidates(
+    start: Vector2D,
+    target: Vector2D,
+    root: SchemaTrieNode,
+    debug: bool = True
+) -> List[Tuple[LinearPathScheme, Vector2D]]:
+    """
+    Collect the schemes of the trie that survive pruning, in the order find_reachable_scheme tries them.
+
+    The counters before a segment are start + fixed_effect of the parent + some multiples of the loop effects so far,
+    so x can only exceed start.x + fixed_effect.x if some earlier loop increases x. If even that largest value is
+    below the guard of the segment, no scheme below the node can pass it, and the whole subtree is skipped.
+    Likewise a scheme ending at a node is only kept if the target lies in the range of counters the node allows.
+
+    The prefix is the same for every scheme below its node and does not depend on the loop counts, so the position
+    after it is computed once there and handed to every scheme of the subtree, for is_reachable to start its
+    simulations from.
+
+    Args:
+        start (Vector2D): The starting position.
+        target (Vector2D): The target position.
+        root (SchemaTrieNode): The trie, as returned by build_schema_trie.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        List[Tuple[LinearPathScheme, Vector2D]]: The schemes left, in depth-first insertion order, each with the
+                                                 position after its prefix.
+    """
+    schemes = []
+    stack = [(root, root.fixed_effect, None)]
+    while stack:
+        node, before, after_prefix = stack.pop()
+        base = start + before
+        if node.key is not None and node.key[0] == 'segment':
+            if (not node.increases[0] and base.x < node.guard[0]) or (not node.increases[1] and base.y < node.guard[1]):
+                if debug:
+                    print(f"Pruning subtree at {node.key}: counters at most {base}, guard {node.guard}")
+                continue
+
+        end = start + node.fixed_effect
+        if after_prefix is None and node.key is not None:
+            # The prefix node: it passed its guard, so the prefix keeps the counters non-negative from start
+            after_prefix = end
+        if node.schemes and (node.decreases[0] or target.x >= end.x) and (node.increases[0] or target.x <= end.x) \
+                and (node.decreases[1] or target.y >= end.y) and (node.increases[1] or target.y <= end.y):
+            schemes.extend((scheme, after_prefix) for scheme in node.schemes)
+
+        # Push children in reverse so they are visited in insertion order
+        for child in reversed(list(node.children.values())):
+            stack.append((child, node.fixed_effect, after_prefix))
+    return schemes
+
+
+def find_reachable_scheme(
+    start: Vector2D,
+    target: Vector2D,
+    root: SchemaTrieNode,
+    debug: bool = True,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None,
+    accept: Optional[Callable[[LinearPathScheme, Optional[List[int]]], bool]] = None
+) -> Tuple[Optional[LinearPathScheme], Optional[List[int]]]:
+    """
+    Search the trie for a scheme that reaches the target.
+
+    The schemes left by trie_candidates get their linear systems solved together by batch_solution_spaces, and
+    only those with a non-negative solution go on to the candidate search of is_reachable, which starts its
+    simulations from the position after the prefix cached by trie_candidates.
+
+    Args:
+        start (Vector2D): The starting position.
+        target (Vector2D): The target position.
+        root (SchemaTrieNode): The trie, as returned by build_schema_trie.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+        state_bounds (Optional[Dict], optional): Upper bounds on the counters per reachable state, passed on to is_reachable.
+        accept (Optional[Callable], optional): Check of a scheme and its iteration counts, e.g. verifying the witness
+                                               they give; a rejected scheme is skipped and the search goes on.
+
+    Returns:
+        Tuple[Optional[LinearPathScheme], Optional[List[int]]]: The first scheme found to reach the target and its
+                                                                loop iteration counts (as from is_reachable), or (None, None).
+    """
+    candidates = trie_candidates(start, target, root, debug)
+    schemes = [scheme for scheme, _ in candidates]
+    for (scheme, after_prefix), space in zip(candidates, batch_solution_spaces(start, target, schemes, debug)):
+        if space is None:
+            continue
+        reachable, iterations = is_reachable(start, target, scheme, debug, state_bounds, space, after_prefix)
+        if reachable and (accept is None or accept(scheme, iterations)):
+            return scheme, iterations
+    return None, None
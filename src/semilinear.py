@@ -0,0 +1,393 @@
+from src.definition import *
+from src.reachabilty_lps import simulate_path, loop_iteration_bounds
+from itertools import islice, product
+import hashlib
+import json
+import numpy as np
+
+
+@dataclass
+class LinearSet:
+    # The targets base + n_1 * periods[0] + n_2 * periods[1] + ... for any base and any n_i >= 0, stored as (x, y) rows.
+    # runs[j] are the loop iteration counts of the scheme that reach bases[j], and period_loops[i] the loop whose
+    # effect is periods[i], so that a run to any member can be rebuilt; both are None in indexes saved without them
+    bases: np.ndarray
+    periods: np.ndarray
+    runs: Optional[np.ndarray] = None
+    period_loops: Optional[np.ndarray] = None
+
+
+@dataclass
+class SemilinearIndex:
+    # sets[i] describes the targets reachable from 'start' with the i-th scheme; exact[i] is False when
+    # some loop of that scheme was only enumerated up to the iteration limit. 'key' is the model_fingerprint
+    # of the model and parameters the index was built for, and 'schemes' the indexed schemes themselves,
+    # kept so that witnesses can be rebuilt without generating the schemes again
+    start: Vector2D
+    sets: List[List[LinearSet]]
+    exact: List[bool]
+    key: str = ""
+    schemes: List[LinearPathScheme] = field(default_factory=list)
+
+
+def model_fingerprint(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start: Vector2D,
+    max_iterations: int = 10,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None
+) -> str:
+    """
+    Hash everything an index depends on: the states and transitions (in order, since the first matching transition
+    is the one a path takes), the initial and final state and vector, max_iterations and the state bounds.
+
+    Returns:
+        str: A SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([start_state, end_state, start.x, start.y, max_iterations,
+                              sorted((state, list(pair)) for state, pair in (state_bounds or {}).items())]).encode())
+    for state_id in sorted(vass.states):
+        transitions = [[target, vector.x, vector.y] for target, vector in vass.get_transitions(state_id)]
+        digest.update(json.dumps([state_id, transitions]).encode())
+    return digest.hexdigest()
+
+
+def is_pumping(loop: Loop) -> bool:
+    """
+    Check whether a loop never decreases a counter, so that once it can be taken it can be repeated forever.
+    """
+    return loop.effect.x >= 0 and loop.effect.y >= 0
+
+
+def scheme_linear_sets(
+    start: Vector2D,
+    scheme: LinearPathScheme,
+    max_iterations: int = 10,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None,
+    max_runs: int = 1024
+) -> Tuple[List[LinearSet], bool]:
+    """
+    Describe the targets reachable from start with a scheme as a union of linear sets.
+
+    A pumping loop (one with a non-negative effect) that can be taken once can be taken any number of
+    times, since larger counters never break a later guard. So pumping loops are tried 0 or 1 times and
+    contribute their effect as a period, while the remaining loops are enumerated explicitly. Every run
+    that passes the guards, as checked by simulate_path, becomes a base of the linear set of the pumping
+    loops it took, together with the iteration counts of that run.
+
+    The enumeration is a cartesian product over the loops, so it grows exponentially with their number. At most
+    max_runs runs are simulated per scheme: the counts of the non-pumping loops are lowered until the product fits,
+    and the product is cut off if it still does not. The index is therefore only complete for schemes with few
+    loops; for the others it keeps answering positive queries but can no longer refute a target.
+
+    Args:
+        start (Vector2D): The starting position.
+        scheme (LinearPathScheme): The scheme to describe.
+        max_iterations (int, optional): The largest count tried for a non-pumping loop. Defaults to 10.
+        state_bounds (Optional[Dict], optional): Upper bounds on the counters per reachable state, as from
+                                                 state_upper_bounds, used to cap the counts further. Defaults to None.
+        max_runs (int, optional): The largest number of runs simulated for the scheme. Defaults to 1024.
+
+    Returns:
+        Tuple[List[LinearSet], bool]: The linear sets, and whether they are exact. They are not exact when
+                                      a non-pumping loop may be taken more than max_iterations times, or when
+                                      the enumeration was cut down to max_runs.
+    """
+    limits = loop_iteration_bounds(scheme, state_bounds) if state_bounds is not None else np.full(len(scheme.loops), np.inf)
+    exact = True
+    counts = []
+    for loop, limit in zip(scheme.loops, limits):
+        if is_pumping(loop):
+            counts.append(int(min(limit, 1)))
+        else:
+            exact = exact and bool(limit <= max_iterations)
+            counts.append(int(min(limit, max_iterations)))
+
+    # Lower the largest counts of non-pumping loops until the product of the ranges fits into max_runs
+    pumping = [is_pumping(loop) for loop in scheme.loops]
+    while np.prod([count + 1 for count in counts], dtype=float) > max_runs:
+        largest = max((i for i in range(len(counts)) if not pumping[i]), key=lambda i: counts[i], default=None)
+        if largest is None or counts[largest] == 0:
+            break
+        counts[largest] -= 1
+        exact = False
+    total = np.prod([count + 1 for count in counts], dtype=float)
+    exact = exact and bool(total <= max_runs)
+
+    bases = {}
+    for iterations in islice(product(*(range(count + 1) for count in counts)), max_runs):
+        valid, pos = simulate_path(start, scheme, list(iterations), False)
+        if not valid:
+            continue
+        fired = tuple(i for i, count in enumerate(iterations)
+                      if count > 0 and is_pumping(scheme.loops[i]) and scheme.loops[i].effect != Vector2D(0, 0))
+        bases.setdefault(fired, {}).setdefault((pos.x, pos.y), iterations)
+
+    sets = []
+    for fired, runs in bases.items():
+        # One loop per distinct period; taking it more often than in the base run gives the multiples
+        period_loops = {}
+        for i in fired:
+            period_loops.setdefault((scheme.loops[i].effect.x, scheme.loops[i].effect.y), i)
+        periods = sorted(period_loops)
+        points = sorted(runs)
+        sets.append(LinearSet(np.array(points, dtype=np.int64).reshape(-1, 2),
+                              np.array(periods, dtype=np.int64).reshape(-1, 2),
+                              np.array([runs[point] for point in points], dtype=np.int64).reshape(len(points), len(scheme.loops)),
+                              np.array([period_loops[period] for period in periods], dtype=np.int64)))
+    return sets, exact
+
+
+def build_index(
+    start: Vector2D,
+    schemes: List[LinearPathScheme],
+    max_iterations: int = 10,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None
+) -> SemilinearIndex:
+    """
+    Precompute the linear sets of every scheme for a fixed start position.
+
+    Args:
+        start (Vector2D): The starting position shared by all queries.
+        schemes (List[LinearPathScheme]): The schemes to index.
+        max_iterations (int, optional): The largest count tried for a non-pumping loop. Defaults to 10.
+        state_bounds (Optional[Dict], optional): Upper bounds on the counters per reachable state. Defaults to None.
+
+    Returns:
+        SemilinearIndex: The index.
+    """
+    index = SemilinearIndex(start, [], [], schemes=list(schemes))
+    for scheme in schemes:
+        sets, exact = scheme_linear_sets(start, scheme, max_iterations, state_bounds)
+        index.sets.append(sets)
+        index.exact.append(exact)
+    return index
+
+
+def monoid_decompose(residuals: np.ndarray, periods: np.ndarray) -> Optional[Tuple[int, List[int]]]:
+    """
+    Find a residual that is a non-negative integer combination of the periods, and the combination.
+
+    Args:
+        residuals (np.ndarray): Candidate (x, y) rows.
+        periods (np.ndarray): Non-zero, non-negative (x, y) period rows.
+
+    Returns:
+        Optional[Tuple[int, List[int]]]: The row of the first such residual found and the coefficients n_i >= 0 with
+                                         residual = n_1 * periods[0] + n_2 * periods[1] + ..., or None.
+    """
+    # Periods are non-negative, so a residual with a negative component can never be reached
+    rows = np.nonzero((residuals >= 0).all(axis=1))[0]
+    residuals = residuals[rows]
+    if len(residuals) == 0:
+        return None
+    if len(periods) == 0:
+        found = np.nonzero((residuals == 0).all(axis=1))[0]
+        return (int(rows[found[0]]), []) if len(found) else None
+
+    if len(periods) == 1:
+        px, py = periods[0]
+        collinear = residuals[:, 0] * py == residuals[:, 1] * px
+        axis = 0 if px != 0 else 1
+        divisible = residuals[:, axis] % periods[0][axis] == 0
+        found = np.nonzero(collinear & divisible)[0]
+        if not len(found):
+            return None
+        return int(rows[found[0]]), [int(residuals[found[0], axis] // periods[0][axis])]
+
+    if len(periods) == 2:
+        (px, py), (qx, qy) = periods
+        det = px * qy - py * qx
+        if det != 0:
+            # Cramer's rule; both coefficients must be non-negative integers
+            n = residuals[:, 0] * qy - residuals[:, 1] * qx
+            m = px * residuals[:, 1] - py * residuals[:, 0]
+            found = np.nonzero((n % det == 0) & (m % det == 0) & (n * det >= 0) & (m * det >= 0))[0]
+            if not len(found):
+                return None
+            return int(rows[found[0]]), [int(n[found[0]] // det), int(m[found[0]] // det)]
+
+    # Enumerate the multiples of the largest period and recurse on the others
+    order = np.argsort(-periods.sum(axis=1))
+    period, rest = periods[order[0]], periods[order[1:]]
+    limits = [residuals[:, axis] // period[axis] for axis in (0, 1) if period[axis] > 0]
+    bound = int(np.minimum.reduce(limits).max())
+    counts = np.arange(bound + 1, dtype=np.int64)
+    expanded = (residuals[:, None, :] - counts[None, :, None] * period).reshape(-1, 2)
+    unique, first = np.unique(expanded, axis=0, return_index=True)
+    found = monoid_decompose(unique, rest)
+    if found is None:
+        return None
+    row, count = divmod(int(first[found[0]]), bound + 1)
+    coefficients = [0] * len(periods)
+    coefficients[order[0]] = count
+    for i, coefficient in zip(order[1:], found[1]):
+        coefficients[i] = coefficient
+    return int(rows[row]), coefficients
+
+
+def monoid_contains(residuals: np.ndarray, periods: np.ndarray) -> bool:
+    """
+    Check whether any of the residuals is a non-negative integer combination of the periods.
+
+    Args:
+        residuals (np.ndarray): Candidate (x, y) rows.
+        periods (np.ndarray): Non-zero, non-negative (x, y) period rows.
+
+    Returns:
+        bool: True if some residual equals n_1 * periods[0] + n_2 * periods[1] + ... with integers n_i >= 0.
+    """
+    return monoid_decompose(residuals, periods) is not None
+
+
+def query_index(index: SemilinearIndex, target: Vector2D) -> Optional[int]:
+    """
+    Look up which scheme, if any, reaches the target.
+
+    Args:
+        index (SemilinearIndex): The index built for the start position.
+        target (Vector2D): The target position.
+
+    Returns:
+        Optional[int]: The position of the first scheme that reaches the target, or None.
+    """
+    point = np.array([target.x, target.y], dtype=np.int64)
+    for i, sets in enumerate(index.sets):
+        for linear_set in sets:
+            if monoid_contains(point - linear_set.bases, linear_set.periods):
+                return i
+    return None
+
+
+def query_run(index: SemilinearIndex, target: Vector2D) -> Optional[Tuple[int, Optional[List[int]]]]:
+    """
+    Look up which scheme, if any, reaches the target, and with which loop iteration counts.
+
+    The counts are those of the base run, plus the multiples of the periods on the loops that give them.
+
+    Args:
+        index (SemilinearIndex): The index built for the start position.
+        target (Vector2D): The target position.
+
+    Returns:
+        Optional[Tuple[int, Optional[List[int]]]]: The position of the first scheme that reaches the target and its
+                                                   iteration counts (None if the index holds no runs), or None.
+    """
+    point = np.array([target.x, target.y], dtype=np.int64)
+    for i, sets in enumerate(index.sets):
+        for linear_set in sets:
+            found = monoid_decompose(point - linear_set.bases, linear_set.periods)
+            if found is None:
+                continue
+            if linear_set.runs is None:
+                return i, None
+            row, coefficients = found
+            iterations = [int(count) for count in linear_set.runs[row]]
+            for loop, coefficient in zip(linear_set.period_loops, coefficients):
+                iterations[loop] += coefficient
+            return i, iterations
+    return None
+
+
+def encode_scheme(scheme: LinearPathScheme) -> dict:
+    """
+    Describe a scheme, with its path and loop cycles, as plain lists for JSON.
+    """
+    vectors = lambda items: [[vector.x, vector.y] for vector in items]
+    return {
+        "path": scheme.path,
+        "prefix": vectors(scheme.prefix_vectors),
+        "between": [vectors(items) for items in scheme.between_vectors],
+        "suffix": vectors(scheme.suffix_vectors),
+        "loops": [{"effect": [loop.effect.x, loop.effect.y], "guard": list(loop.guard),
+                   "cycle": None if loop.cycle is None else [[f, t, v.x, v.y] for f, t, v in loop.cycle]}
+                  for loop in scheme.loops],
+    }
+
+
+def decode_scheme(data: dict) -> LinearPathScheme:
+    """
+    Rebuild a scheme written by encode_scheme.
+    """
+    vectors = lambda items: [intern_vector(x, y) for x, y in items]
+    loops = [Loop(intern_vector(*loop["effect"]), tuple(loop["guard"]),
+                  None if loop["cycle"] is None else [(f, t, intern_vector(x, y)) for f, t, x, y in loop["cycle"]])
+             for loop in data["loops"]]
+    return LinearPathScheme(vectors(data["prefix"]), loops, [vectors(items) for items in data["between"]],
+                            vectors(data["suffix"]), data["path"])
+
+
+def save_index(index: SemilinearIndex, path: str):
+    """
+    Write an index to a NumPy .npz archive.
+
+    The linear sets of all schemes are concatenated into a few flat arrays with offsets, and the key, start and
+    schemes go into a small JSON string, so that loading the index is a handful of array reads rather than
+    parsing one list per base.
+
+    Args:
+        index (SemilinearIndex): The index to save.
+        path (str): The file to write, used as given (no .npz suffix is added).
+    """
+    sets = [(i, linear_set) for i, scheme_sets in enumerate(index.sets) for linear_set in scheme_sets]
+    with_runs = all(linear_set.runs is not None for _, linear_set in sets)
+    offsets = lambda sizes: np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]).astype(np.int64)
+    concat = lambda arrays, shape: np.concatenate(arrays).astype(np.int64) if arrays else np.zeros(shape, dtype=np.int64)
+
+    meta = {
+        "key": index.key,
+        "start": [index.start.x, index.start.y],
+        "exact": index.exact,
+        "schemes": [encode_scheme(scheme) for scheme in index.schemes],
+    }
+    arrays = {
+        "meta": np.array(json.dumps(meta)),
+        "set_scheme": np.array([i for i, _ in sets], dtype=np.int64),
+        "base_offsets": offsets([len(linear_set.bases) for _, linear_set in sets]),
+        "period_offsets": offsets([len(linear_set.periods) for _, linear_set in sets]),
+        "bases": concat([linear_set.bases for _, linear_set in sets], (0, 2)),
+        "periods": concat([linear_set.periods for _, linear_set in sets], (0, 2)),
+    }
+    if with_runs:
+        arrays["runs"] = concat([linear_set.runs.ravel() for _, linear_set in sets], (0,))
+        arrays["run_offsets"] = offsets([linear_set.runs.size for _, linear_set in sets])
+        arrays["period_loops"] = concat([linear_set.period_loops for _, linear_set in sets], (0,))
+    with open(path, 'wb') as file:
+        np.savez(file, **arrays)
+
+
+def load_index(path: str) -> SemilinearIndex:
+    """
+    Read an index written by save_index.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        SemilinearIndex: The index.
+
+    Raises:
+        ValueError: If the file is not an index archive, e.g. one in an older format.
+    """
+    with open(path, 'rb') as file:
+        if file.read(4) != b"PK\x03\x04":
+            raise ValueError(f"{path} is not a semilinear index archive")
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+
+    meta = json.loads(str(arrays["meta"]))
+    index = SemilinearIndex(Vector2D(*meta["start"]), [[] for _ in meta["exact"]], list(meta["exact"]), meta["key"],
+                            [decode_scheme(scheme) for scheme in meta["schemes"]])
+    base_offsets, period_offsets = arrays["base_offsets"].tolist(), arrays["period_offsets"].tolist()
+    run_offsets = arrays["run_offsets"].tolist() if "runs" in arrays else None
+    for k, i in enumerate(arrays["set_scheme"].tolist()):
+        bases = arrays["bases"][base_offsets[k]:base_offsets[k + 1]]
+        periods = arrays["periods"][period_offsets[k]:period_offsets[k + 1]]
+        runs = period_loops = None
+        if run_offsets is not None:
+            runs = arrays["runs"][run_offsets[k]:run_offsets[k + 1]].reshape(len(bases), -1)
+            period_loops = arrays["period_loops"][period_offsets[k]:period_offsets[k + 1]]
+        index.sets[i].append(LinearSet(bases, periods, runs, period_loops))
+    return index
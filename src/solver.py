@@ -0,0 +1,286 @@
+from src.definition import *
+from src.generate_lps import generate_linear_path_schemas
+from src.schema_trie import build_schema_trie, find_reachable_scheme
+from src.reachability_bfs import bfs_reachable, bfs_search, escapes_box, default_bounds
+from src.reachability_bidir import bidirectional_reachable
+from src.coverability import build_coverability_tree, is_coverable, state_upper_bounds
+from src.utils import convert_json_to_vass
+from src.semilinear import SemilinearIndex, build_index, query_run, save_index, load_index, model_fingerprint
+from src.witness import build_witness, format_witness, verify_witness
+from src.binary_model import is_binary_model, load_binary_vass
+from src.planner import plan_engine, format_plan
+from typing import Iterable, Iterator
+import json
+import os
+
+
+@dataclass
+class SolverResult:
+    # 'message' is the verdict line printed by main.py, 'witness' the run-length encoded run if one was found,
+    # 'explanation' the plan of the auto engine and any fallback it took
+    reachable: bool
+    message: str
+    witness: Optional[str] = None
+    explanation: Optional[str] = None
+
+
+def load_config(path: str) -> Tuple[VASS2D, int, int, Vector2D, Vector2D]:
+    """
+    Read a configuration file, either JSON or a binary model written by convert_json_to_binary.
+
+    Args:
+        path (str): Path to the configuration file.
+
+    Returns:
+        Tuple[VASS2D, int, int, Vector2D, Vector2D]: The VASS2D instance, start state, end state,
+                                                     initial vector, and final vector.
+    """
+    if is_binary_model(path):
+        return load_binary_vass(path)
+    with open(path, 'r') as file:
+        json_data = json.load(file)
+    return convert_json_to_vass(json_data)
+
+
+def solve(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start_vector: Vector2D,
+    target_vector: Vector2D,
+    engine: str = 'lps',
+    bounds: Optional[Tuple[int, int]] = None,
+    precheck: bool = True,
+    index_path: Optional[str] = None,
+    witness: bool = False
+) -> SolverResult:
+    """
+    Decide whether the target vector is reachable, as main.py does for a single configuration.
+
+    Args:
+        vass (VASS2D): The VASS to analyze.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start_vector (Vector2D): The initial vector.
+        target_vector (Vector2D): The target vector.
+        engine (str, optional): 'lps' for linear path schemas, 'bfs' for the bounded search, 'bidir' for the
+                                bounded bidirectional search or 'auto' to let plan_engine pick. Defaults to 'lps'.
+        bounds (Optional[Tuple[int, int]], optional): Counter bounds for the bfs and bidir engines. Defaults to default_bounds.
+        precheck (bool, optional): Whether the coverability pre-check may run first; with 'auto' the planner
+                                   still decides whether it is worth running. Defaults to True.
+        index_path (Optional[str], optional): Semilinear index file for the lps engine, built and saved if missing.
+        witness (bool, optional): Whether a witness run is wanted; with 'auto' it makes the planner pick the schemas,
+                                  the only engine that gives one. Defaults to False.
+
+    Returns:
+        SolverResult: The verdict.
+    """
+    # The planner decides whether the pre-check is worth running; with a forced engine the flag alone decides
+    plan = None
+    notes = []
+    if engine == 'auto':
+        plan = plan_engine(vass, start_state, end_state, start_vector, target_vector, bounds, precheck,
+                           witness=witness, index=index_path is not None)
+        precheck = plan.precheck
+
+    # A target that cannot even be covered cannot be reached; a complete tree also bounds the counters per state
+    state_bounds = None
+    if precheck:
+        tree = build_coverability_tree(vass, start_state, start_vector, debug=False)
+        if tree.complete:
+            if not is_coverable(tree, end_state, target_vector):
+                explanation = None
+                if plan is not None:
+                    explanation = format_plan(plan) + "\nStopped: the coverability pre-check refuted the target, so no engine ran"
+                return SolverResult(False, f"Target {target_vector} is not reachable (not coverable)", explanation=explanation)
+            state_bounds = state_upper_bounds(tree)
+            if plan is not None:
+                # The bounds may close the box of the bounded search, which changes its cost and exactness
+                plan = plan_engine(vass, start_state, end_state, start_vector, target_vector, bounds, precheck, state_bounds,
+                                   witness=witness, index=index_path is not None)
+        elif plan is not None:
+            notes.append("Note: the coverability pre-check stopped at its node limit and was not used")
+
+    # The planner only guesses: a positive answer of the search is exact, a negative one only when the box
+    # holds every reachable configuration, and otherwise the schemas get the final say
+    explanation = None
+    if plan is not None:
+        explanation = "\n".join([format_plan(plan)] + notes)
+        engine = 'lps'
+        if plan.engine == 'bfs':
+            try:
+                reachable, steps, visited = bfs_search(vass, start_state, end_state, start_vector, target_vector, plan.bounds, False)
+            except ValueError as error:
+                explanation += f"\nFallback: the bounded search failed ({error}), using the schemas"
+            else:
+                if reachable:
+                    return SolverResult(True, f"Target {target_vector} is reachable in {steps} steps", explanation=explanation)
+                if visited is not None and (plan.closed or not escapes_box(vass, visited, plan.bounds)):
+                    return SolverResult(False, f"Target {target_vector} is not reachable", explanation=explanation)
+                explanation += "\nFallback: the bounded search found nothing but runs may leave the box, using the schemas"
+
+    if engine in ('bfs', 'bidir'):
+        bounds = bounds or default_bounds(vass, start_vector, target_vector)
+        search = bfs_reachable if engine == 'bfs' else bidirectional_reachable
+        reachable, steps = search(vass, start_state, end_state, start_vector, target_vector, bounds, False)
+        if reachable:
+            return SolverResult(True, f"Target {target_vector} is reachable in {steps} steps")
+        return SolverResult(False, f"Target {target_vector} is not reachable within the bounds {bounds}")
+
+    return next(schema_results(vass, start_state, end_state, start_vector, [target_vector], state_bounds, index_path, explanation))
+
+
+def generate_schemas(vass: VASS2D, start_state: int, end_state: int) -> List[LinearPathScheme]:
+    """
+    Generate the linear path schemes from the start to the end state, with the path length and cycle bounds used throughout.
+    """
+    n_states = len(vass.states)
+    n_transitions = vass.transition_count()
+    max_path_length = 2*n_states*n_transitions    # |p| <= 2*|U|*|E|
+    max_cycles = n_transitions                    # |p| <= |E|
+    return generate_linear_path_schemas(vass, start_state, end_state, max_path_length, max_cycles)
+
+
+def open_index(
+    index_path: str,
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start_vector: Vector2D,
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None
+) -> SemilinearIndex:
+    """
+    Load the semilinear index of a start vector, building and saving it first if it is missing or stale.
+
+    An index built for another model, start or set of parameters would answer wrongly, and one in an older format
+    cannot give witnesses, so both are rebuilt.
+
+    Args:
+        index_path (str): The index file.
+        vass (VASS2D): The VASS to analyze.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start_vector (Vector2D): The initial vector.
+        state_bounds (Optional[Dict], optional): Counter bounds per state from the coverability pre-check.
+
+    Returns:
+        SemilinearIndex: The index.
+    """
+    key = model_fingerprint(vass, start_state, end_state, start_vector, state_bounds=state_bounds)
+    try:
+        index = load_index(index_path) if os.path.isfile(index_path) else None
+    except ValueError:
+        index = None
+    if index is None or index.key != key:
+        index = build_index(start_vector, generate_schemas(vass, start_state, end_state), state_bounds=state_bounds)
+        index.key = key
+        save_index(index, index_path)
+    return index
+
+
+def schema_results(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start_vector: Vector2D,
+    targets: Iterable[Vector2D],
+    state_bounds: Optional[Dict[int, Tuple[Optional[int], Optional[int]]]] = None,
+    index_path: Optional[str] = None,
+    explanation: Optional[str] = None
+) -> Iterator[SolverResult]:
+    """
+    Answer targets from one start vector with the schema engine, sharing the work that does not depend on the target.
+
+    The index, if any, is opened once and answers first: a hit gives the scheme and its iteration counts directly,
+    and a miss rules out every scheme the index describes exactly. Only the schemes it describes inexactly are then
+    searched, in a trie built once. Without an index, all schemes are generated and searched. Every run is checked
+    with verify_witness before it is reported.
+
+    Args:
+        vass (VASS2D): The VASS to analyze.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start_vector (Vector2D): The initial vector.
+        targets (Iterable[Vector2D]): The target vectors.
+        state_bounds (Optional[Dict], optional): Counter bounds per state from the coverability pre-check.
+        index_path (Optional[str], optional): Semilinear index file, built and saved if missing.
+        explanation (Optional[str], optional): Passed on to the results.
+
+    Yields:
+        SolverResult: The verdict for each target, in order.
+    """
+    def verified(target: Vector2D, scheme: LinearPathScheme, iterations: Optional[List[int]]) -> bool:
+        # Only runs that verify_witness accepts are reported; any other scheme is passed over
+        return verify_witness(start_vector, target, build_witness(scheme, iterations), start_state, end_state, False)
+
+    index = open_index(index_path, vass, start_state, end_state, start_vector, state_bounds) if index_path else None
+    tries = {}
+
+    def search(target: Vector2D, schemes_key: str) -> SolverResult:
+        if schemes_key not in tries:
+            if schemes_key == 'all':
+                schemes = index.schemes if index is not None else generate_schemas(vass, start_state, end_state)
+            else:
+                schemes = [scheme for scheme, exact in zip(index.schemes, index.exact) if not exact]
+            tries[schemes_key] = build_schema_trie(schemes)
+        lps, iterations = find_reachable_scheme(start_vector, target, tries[schemes_key], False, state_bounds,
+                                                lambda scheme, counts: verified(target, scheme, counts))
+        if lps is not None:
+            return SolverResult(True, f"Target {target} is reachable", format_witness(build_witness(lps, iterations)), explanation)
+        return SolverResult(False, f"Target {target} is not reachable", explanation=explanation)
+
+    for target in targets:
+        if index is None:
+            yield search(target, 'all')
+            continue
+        hit = query_run(index, target)
+        if hit is None:
+            if all(index.exact):
+                yield SolverResult(False, f"Target {target} is not reachable", explanation=explanation)
+            else:
+                yield search(target, 'inexact')
+            continue
+        scheme, iterations = index.schemes[hit[0]], hit[1]
+        if iterations is not None and verified(target, scheme, iterations):
+            yield SolverResult(True, f"Target {target} is reachable", format_witness(build_witness(scheme, iterations)), explanation)
+        else:
+            yield search(target, 'all')
+
+
+def solve_targets(
+    vass: VASS2D,
+    start_state: int,
+    end_state: int,
+    start_vector: Vector2D,
+    targets: Iterable[Vector2D],
+    precheck: bool = True,
+    index_path: Optional[str] = None
+) -> List[SolverResult]:
+    """
+    Decide many target vectors from one start vector with the schema engine, as main.py does for --targets.
+
+    The coverability tree, the index and the schemes are computed once for all targets (see schema_results),
+    so this is much cheaper than calling solve per target.
+
+    Args:
+        vass (VASS2D): The VASS to analyze.
+        start_state (int): The initial state.
+        end_state (int): The final state.
+        start_vector (Vector2D): The initial vector.
+        targets (Iterable[Vector2D]): The target vectors.
+        precheck (bool, optional): Whether to run the coverability pre-check first. Defaults to True.
+        index_path (Optional[str], optional): Semilinear index file, built and saved if missing.
+
+    Returns:
+        List[SolverResult]: The verdict for each target, in order.
+    """
+    targets = list(targets)
+    tree = build_coverability_tree(vass, start_state, start_vector, debug=False) if precheck else None
+    if tree is None or not tree.complete:
+        return list(schema_results(vass, start_state, end_state, start_vector, targets, None, index_path))
+
+    coverable = [target for target in targets if is_coverable(tree, end_state, target)]
+    answers = schema_results(vass, start_state, end_state, start_vector, coverable, state_upper_bounds(tree), index_path)
+    covered = set(coverable)
+    return [next(answers) if target in covered else SolverResult(False, f"Target {target} is not reachable (not coverable)")
+            for target in targets]
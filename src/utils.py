@@ -15,7 +15,7 @@ def convert_json_to_vass(json_data):
     for state_id in json_data["states"]:
         # Create transitions for the current state
         transitions = [
-            (transition["to"], Vector2D(*transition["vector"]))
+            (transition["to"], intern_vector(*transition["vector"]))
             for transition in json_data["transitions"]
             if transition["from"] == state_id
         ]
@@ -44,15 +44,31 @@ def apply_vectors(pos: Vector2D, vectors: List[Vector2D], debug: bool = True) ->
                                are non-negative and the final position after applying all vectors.
     """
 
+    position = Accumulator(pos.x, pos.y)
+    valid = apply_vectors_in_place(position, vectors, debug)
+    return valid, position.vector()
+
+def apply_vectors_in_place(position: Accumulator, vectors: List[Vector2D], debug: bool = True) -> bool:
+    """
+    Like apply_vectors, but adds the vectors to a mutable position instead of allocating a new vector per step.
+
+    Args:
+        position (Accumulator): The position, updated in place. On failure it holds the first negative position.
+        vectors (List[Vector2D]): A list of vectors to be applied to the position.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        bool: Whether all intermediate positions are non-negative.
+    """
     for i, vec in enumerate(vectors):
-        pos = pos + vec
+        position.add(vec)
         if debug:
-            print(f"After vector {i}: {pos}")
-        if pos.x < 0 or pos.y < 0:
+            print(f"After vector {i}: {position}")
+        if position.is_negative():
             if debug:
-                print(f"Negative coordinates after vector {i}: {pos}")
-            return False, pos
-    return True, pos
+                print(f"Negative coordinates after vector {i}: {position}")
+            return False
+    return True
 
 def sum_vectors(vectors: List[Vector2D]) -> Vector2D:
     """
@@ -64,7 +80,10 @@ def sum_vectors(vectors: List[Vector2D]) -> Vector2D:
     Returns:
         Vector2D: The resulting Vector2D object after summing all vectors in the list.
     """
-    return sum((vec for vec in vectors), Vector2D(0, 0))
+    total = Accumulator()
+    for vec in vectors:
+        total.add(vec)
+    return intern_vector(total.x, total.y)
 
 
 def compute_path_effect(vass: VASS2D, path: List[int]) -> Vector2D:
@@ -78,15 +97,37 @@ def compute_path_effect(vass: VASS2D, path: List[int]) -> Vector2D:
     Returns:
         Vector2D: The cumulative effect as a 2D vector resulting from following the given path.
     """
-    effect = Vector2D(0, 0)
+    effect = Accumulator()
+    for i in range(len(path) - 1):
+        current = path[i]
+        next_state = path[i + 1]
+        for target, vector in vass.get_transitions(current):
+            if target == next_state:
+                effect.add(vector)
+                break
+    return intern_vector(effect.x, effect.y)
+
+def path_transitions(vass: VASS2D, path: List[int]) -> List[Tuple[int, int, Vector2D]]:
+    """
+    Resolve a path of states into the transitions taken along it.
+
+    Args:
+        vass (VASS2D): An instance of the VASS2D class representing the vector addition system.
+        path (List[int]): A list of integers representing the sequence of states in the path.
+
+    Returns:
+        List[Tuple[int, int, Vector2D]]: The (from_state, to_state, vector) triples of the path. Like
+                                         compute_path_effect, the first matching transition is used.
+    """
+    transitions = []
     for i in range(len(path) - 1):
         current = path[i]
         next_state = path[i + 1]
         for target, vector in vass.get_transitions(current):
             if target == next_state:
-                effect = effect + vector
+                transitions.append((current, next_state, vector))
                 break
-    return effect
+    return transitions
 
 def compute_guard(vass: VASS2D, cycle: List[int]) -> Tuple[int, int]:
     """
@@ -173,7 +214,8 @@ def find_cycles(vass: VASS2D, state: int) -> List[Loop]:
         if next_state == state:
             cycles.append(Loop(
                 effect=vector,
-                guard=(abs(min(0, vector.x)), abs(min(0, vector.y)))
+                guard=(abs(min(0, vector.x)), abs(min(0, vector.y))),
+                cycle=((state, state, vector),)
             ))
     
     # DFS-like function to identify cycles of length > 1
@@ -185,7 +227,7 @@ def find_cycles(vass: VASS2D, state: int) -> List[Loop]:
                     cycle_path = path + [state]
                     effect = compute_path_effect(vass, cycle_path)
                     guard = compute_guard(vass, cycle_path)
-                    cycles.append(Loop(effect=effect, guard=guard))
+                    cycles.append(Loop(effect=effect, guard=guard, cycle=path_transitions(vass, cycle_path)))
             elif next_state not in visited:
                 # Explore further if the state hasn't been visited yet
                 visited.add(next_state)
@@ -0,0 +1,144 @@
+from src.definition import *
+from typing import Iterable
+
+
+def _segment_transitions(path: List[int], first: int, last: int, vectors: List[Vector2D]) -> List[Tuple[int, int, Vector2D]]:
+    # Pair the states path[first..last] with the vectors the scheme recorded for that stretch of the path
+    return [(path[idx], path[idx + 1], vector) for idx, vector in zip(range(first, last), vectors)]
+
+
+def build_witness(scheme: LinearPathScheme, iterations: Optional[List[int]]) -> List[WitnessSegment]:
+    """
+    Rebuild a run-length encoded run from a linear path scheme and its loop iteration counts.
+
+    Every loop is mapped back to its state cycle and emitted once together with its iteration count,
+    so the size of the witness depends only on the size of the scheme, not on the counts.
+
+    Args:
+        scheme (LinearPathScheme): The scheme the iteration counts belong to. It must carry its path and loop cycles.
+        iterations (Optional[List[int]]): The number of times each loop is taken, as returned by is_reachable.
+                                          None is treated as a scheme without loops.
+
+    Returns:
+        List[WitnessSegment]: The segments of the run in execution order. Segments with a zero count are left out.
+
+    Raises:
+        ValueError: If the scheme does not carry the state information needed to rebuild the run.
+    """
+    iterations = iterations or [0] * len(scheme.loops)
+    if scheme.path is None or any(loop.cycle is None for loop in scheme.loops):
+        raise ValueError("Scheme carries no state information to rebuild a witness from")
+    if len(iterations) != len(scheme.loops):
+        raise ValueError(f"Expected {len(scheme.loops)} iteration counts, got {len(iterations)}")
+
+    path = scheme.path
+    if len(scheme.loops) == 0:
+        straight = _segment_transitions(path, 0, len(path) - 1, scheme.prefix_vectors)
+        return [WitnessSegment(straight)] if straight else []
+
+    positions = [path.index(loop.cycle[0][0]) for loop in scheme.loops]
+    pieces = [(_segment_transitions(path, 0, positions[0], scheme.prefix_vectors), 1)]
+    for i, (loop, count) in enumerate(zip(scheme.loops, iterations)):
+        if i > 0:
+            pieces.append((_segment_transitions(path, positions[i - 1], positions[i], scheme.between_vectors[i - 1]), 1))
+        pieces.append((list(loop.cycle), count))
+    pieces.append((_segment_transitions(path, positions[-1], len(path) - 1, scheme.suffix_vectors), 1))
+
+    return [WitnessSegment(transitions, count) for transitions, count in pieces if transitions and count > 0]
+
+
+def segment_profile(transitions: List[Tuple[int, int, Vector2D]]) -> Tuple[Vector2D, Tuple[int, int]]:
+    """
+    Compute the net effect of a segment and the minimum counter values needed to execute it once.
+
+    Args:
+        transitions (List[Tuple[int, int, Vector2D]]): The (from_state, to_state, vector) triples of the segment.
+
+    Returns:
+        Tuple[Vector2D, Tuple[int, int]]: The effect of the segment and its guard, i.e. the absolute values of
+                                          the minimum x and y prefix sums (the same quantity as compute_guard).
+    """
+    current_x = current_y = 0
+    min_x = min_y = 0
+    for _, _, vector in transitions:
+        current_x += vector.x
+        current_y += vector.y
+        min_x = min(min_x, current_x)
+        min_y = min(min_y, current_y)
+    return Vector2D(current_x, current_y), (abs(min_x), abs(min_y))
+
+
+def verify_witness(start: Vector2D, target: Vector2D, witness: Iterable[WitnessSegment],
+                   start_state: Optional[int] = None, final_state: Optional[int] = None, debug: bool = True) -> bool:
+    """
+    Check that a run-length encoded witness is a valid run from start to target.
+
+    The segments are consumed one at a time. A segment repeated n times only needs its guard checked before
+    the first and before the last repetition, since the counters change linearly in between, so the check
+    runs in time linear in the size of the witness however large the counts are.
+
+    Args:
+        start (Vector2D): The starting counter values.
+        target (Vector2D): The counter values the run must end in.
+        witness (Iterable[WitnessSegment]): The segments of the run, e.g. as returned by build_witness.
+        start_state (Optional[int], optional): If given, the state the run must start in.
+        final_state (Optional[int], optional): If given, the state the run must end in.
+        debug (bool, optional): If True, prints debug information. Defaults to True.
+
+    Returns:
+        bool: True if every segment is connected, stays non-negative and the run ends in target.
+    """
+    pos = start
+    state = start_state
+    for i, segment in enumerate(witness):
+        if segment.count < 0:
+            if debug:
+                print(f"Negative count in segment {i}: {segment.count}")
+            return False
+        if segment.count == 0 or not segment.transitions:
+            continue
+
+        # Transitions must be connected, and repeated segments must return to their first state
+        for from_state, to_state, _ in segment.transitions:
+            if state is not None and from_state != state:
+                if debug:
+                    print(f"Disconnected transition in segment {i}: expected state {state}, got {from_state}")
+                return False
+            state = to_state
+        if segment.count > 1 and state != segment.transitions[0][0]:
+            if debug:
+                print(f"Segment {i} is repeated but is not a cycle")
+            return False
+
+        effect, guard = segment_profile(segment.transitions)
+        last = pos + effect * (segment.count - 1)
+        if min(pos.x, last.x) < guard[0] or min(pos.y, last.y) < guard[1]:
+            if debug:
+                print(f"Failed guard check at segment {i}: pos={pos}, guard={guard}, count={segment.count}")
+            return False
+        pos = pos + effect * segment.count
+        if debug:
+            print(f"After segment {i} ({segment.count} times): {pos}")
+
+    if final_state is not None and state is not None and state != final_state:
+        if debug:
+            print(f"Run ends in state {state} instead of {final_state}")
+        return False
+    return pos == target
+
+
+def format_witness(witness: Iterable[WitnessSegment]) -> str:
+    """
+    Render a witness with one line per segment, e.g. "[1 -(2, -1)-> 1] x 1200000" for a repeated cycle.
+
+    Args:
+        witness (Iterable[WitnessSegment]): The segments of the run.
+
+    Returns:
+        str: The run-length encoded run.
+    """
+    lines = []
+    for segment in witness:
+        steps = str(segment.transitions[0][0]) + "".join(f" -{vector}-> {to_state}" for _, to_state, vector in segment.transitions)
+        lines.append(f"[{steps}] x {segment.count}" if segment.count != 1 else steps)
+    return "\n".join(lines)
@@ -0,0 +1,32 @@
+import json
+import os
+from src.generate_lps import generate_linear_path_schemas
+from src.reachabilty_lps import is_reachable
+from src.utils import convert_json_to_vass
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def load_example(name: str) -> tuple:
+    """
+    Load an example configuration as (vass, start_state, end_state, start_vector, target_vector).
+    """
+    with open(os.path.join(EXAMPLES, name)) as file:
+        return convert_json_to_vass(json.load(file))
+
+
+def schema_verdict(name: str) -> tuple:
+    """
+    Load an example and decide it with the plain schema pipeline, the reference the other engines are checked against.
+
+    Returns:
+        tuple: The configuration, as from load_example, and whether some schema reaches the target.
+    """
+    with open(os.path.join(EXAMPLES, name)) as file:
+        json_data = json.load(file)
+    vass, start_state, end_state, start_vector, target_vector = convert_json_to_vass(json_data)
+
+    n_transitions = len(json_data["transitions"])
+    schemas = generate_linear_path_schemas(vass, start_state, end_state, 2 * len(json_data["states"]) * n_transitions, n_transitions)
+    expected = any(is_reachable(start_vector, target_vector, lps, False)[0] for lps in schemas)
+    return (vass, start_state, end_state, start_vector, target_vector), expected
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import src.batch
+from src.batch import collect_configs, read_journal, run_config, run_batch
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "..", "examples")
+
+# Many loops on every state make the schema search run for minutes
+SLOW_CONFIG = {
+    "states": [0, 1, 2, 3],
+    "transitions": [
+        {"from": 0, "to": 1, "vector": [1, 0]}, {"from": 1, "to": 2, "vector": [0, 1]},
+        {"from": 2, "to": 3, "vector": [1, 1]}, {"from": 1, "to": 1, "vector": [1, -1]},
+        {"from": 2, "to": 2, "vector": [-1, 1]}, {"from": 0, "to": 0, "vector": [2, -1]},
+        {"from": 2, "to": 1, "vector": [-1, 2]}, {"from": 1, "to": 0, "vector": [1, -2]},
+        {"from": 3, "to": 3, "vector": [-1, -1]}, {"from": 0, "to": 0, "vector": [-1, 2]}
+    ],
+    "initial_state": 0,
+    "final_state": 3,
+    "initial_vector": [0, 0],
+    "final_vector": [97, 1]
+}
+
+
+def dying_run_config(path, *args):
+    # Stands in for a worker killed by the OS (e.g. out of memory) while solving die.json
+    if path.endswith("die.json"):
+        os._exit(1)
+    return run_config(path, *args)
+
+
+def test_run_config_timeout(tmp_path):
+    path = str(tmp_path / "slow.json")
+    with open(path, 'w') as file:
+        json.dump(SLOW_CONFIG, file)
+    record = run_config(path, timeout=0.5, engine='lps', precheck=False)
+    assert record["status"] == "timeout"
+
+
+def test_run_batch_resumes_from_journal(tmp_path):
+    for name in ["2.json", "5.json", "8.json"]:
+        shutil.copy(os.path.join(EXAMPLES, name), tmp_path / name)
+    with open(tmp_path / "broken.json", 'w') as file:
+        file.write("{")
+    assert len(collect_configs(str(tmp_path))) == 4
+
+    # A journal left behind by a crash: one finished file and a line cut short
+    journal = str(tmp_path / "journal.jsonl")
+    done = run_config(str(tmp_path / "2.json"))
+    with open(journal, 'w') as file:
+        file.write(json.dumps(done) + "\n" + '{"file": "')
+
+    records = run_batch(str(tmp_path), journal, workers=2, debug=False)
+    assert sorted(os.path.basename(record["file"]) for record in records) == ["5.json", "8.json", "broken.json"]
+
+    journal_records = read_journal(journal)
+    assert len(journal_records) == 4
+    assert journal_records[str(tmp_path / "8.json")]["reachable"] is True
+    assert journal_records[str(tmp_path / "5.json")]["reachable"] is False
+    assert journal_records[str(tmp_path / "broken.json")]["status"] == "error"
+    assert run_batch(str(tmp_path), journal, debug=False) == []
+
+
+def test_run_batch_survives_dead_worker(tmp_path, monkeypatch):
+    for name in ["2.json", "5.json", "8.json"]:
+        shutil.copy(os.path.join(EXAMPLES, name), tmp_path / name)
+    shutil.copy(os.path.join(EXAMPLES, "2.json"), tmp_path / "die.json")
+    # The workers are forked, so they run the patched function
+    monkeypatch.setattr(src.batch, "run_config", dying_run_config)
+
+    journal = str(tmp_path / "journal.jsonl")
+    records = run_batch(str(tmp_path), journal, workers=2, debug=False)
+    assert len(records) == 4
+    journal_records = read_journal(journal)
+    assert journal_records[str(tmp_path / "die.json")]["status"] == "error"
+    assert "BrokenProcessPool" in journal_records[str(tmp_path / "die.json")]["message"]
+    assert all(journal_records[str(tmp_path / name)]["status"] == "ok" for name in ["2.json", "5.json", "8.json"])
+
+
+def test_run_batch_retries_failed_records(tmp_path):
+    shutil.copy(os.path.join(EXAMPLES, "8.json"), tmp_path / "8.json")
+    journal = str(tmp_path / "journal.jsonl")
+    with open(journal, 'w') as file:
+        file.write(json.dumps({"file": str(tmp_path / "8.json"), "status": "timeout"}) + "\n")
+
+    assert run_batch(str(tmp_path), journal, debug=False) == []
+    records = run_batch(str(tmp_path), journal, retry_failed=True, debug=False)
+    assert [record["status"] for record in records] == ["ok"]
+    assert read_journal(journal)[str(tmp_path / "8.json")]["reachable"] is True
+    assert run_batch(str(tmp_path), journal, retry_failed=True, debug=False) == []
@@ -0,0 +1,64 @@
+import json
+import os
+from src.binary_model import convert_json_to_binary, load_binary_vass, is_binary_model
+from src.utils import convert_json_to_vass
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "..", "examples")
+
+
+def test_binary_round_trip_matches_json(tmp_path):
+    for name in sorted(os.listdir(EXAMPLES)):
+        with open(os.path.join(EXAMPLES, name)) as file:
+            json_data = json.load(file)
+        path = str(tmp_path / (name + ".vassb"))
+        convert_json_to_binary(json_data, path)
+        assert is_binary_model(path)
+
+        expected = convert_json_to_vass(json_data)
+        vass, *rest = load_binary_vass(path)
+        assert rest == list(expected[1:])
+        assert sorted(vass.states) == sorted(expected[0].states)
+        for state_id in expected[0].states:
+            assert vass.get_transitions(state_id) == expected[0].get_transitions(state_id)
+            assert vass.states[state_id] == expected[0].states[state_id]
+        assert vass.get_transitions(12345) == ()
+
+        # The transition arrays are views into the mapped file, not copies
+        assert not vass.targets.flags.owndata and not vass.dx.flags.owndata
+
+
+def test_binary_model_widths(tmp_path):
+    json_data = {
+        "states": [5, 1],
+        "transitions": [
+            {"from": 5, "to": 1, "vector": [2**40, -1]},
+            {"from": 1, "to": 5, "vector": [0, 3]},
+            {"from": 5, "to": 5, "vector": [-2**40, 7]}
+        ],
+        "initial_state": 5, "final_state": 1, "initial_vector": [0, 0], "final_vector": [1, 1]
+    }
+    path = str(tmp_path / "wide.vassb")
+    convert_json_to_binary(json_data, path)
+    vass, *_ = load_binary_vass(path)
+    assert vass.dx.itemsize == 8
+    assert [(t, v.x, v.y) for t, v in vass.get_transitions(5)] == [(1, 2**40, -1), (5, -2**40, 7)]
+
+    json_data = {"states": [0], "transitions": [], "initial_state": 0, "final_state": 0,
+                 "initial_vector": [0, 0], "final_vector": [0, 0]}
+    convert_json_to_binary(json_data, path)
+    vass, *_ = load_binary_vass(path)
+    assert vass.dx.itemsize == 4 and vass.get_transitions(0) == ()
+
+
+def test_binary_model_counts_without_materializing(tmp_path):
+    for name in sorted(os.listdir(EXAMPLES)):
+        with open(os.path.join(EXAMPLES, name)) as file:
+            json_data = json.load(file)
+        path = str(tmp_path / (name + ".vassb"))
+        convert_json_to_binary(json_data, path)
+
+        expected = convert_json_to_vass(json_data)[0]
+        vass, *_ = load_binary_vass(path)
+        assert vass.transition_count() == expected.transition_count() == len(json_data["transitions"])
+        assert vass.largest_step() == expected.largest_step()
+        assert vass._transitions == {}
@@ -0,0 +1,59 @@
+import numpy as np
+from src.definition import Vector2D, VASS2D, State, Loop, LinearPathScheme, OMEGA
+from src.coverability import Antichain, build_coverability_tree, is_coverable, state_upper_bounds
+from src.reachabilty_lps import loop_iteration_bounds, generate_solution_candidates
+
+
+def test_coverability_tree_accelerates_pumping_loops():
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, -1)), (1, Vector2D(0, 0))]),
+        1: State(1, [(1, Vector2D(0, 2))]),
+    })
+    tree = build_coverability_tree(vass, 0, Vector2D(0, 3), debug=False)
+    assert tree.complete
+    # The self-loop on state 1 pumps y, so y is accelerated to omega there but never in state 0
+    assert any(y == OMEGA for state, y in zip(tree.states, tree.ys) if state == 1)
+    assert all(y != OMEGA for state, y in zip(tree.states, tree.ys) if state == 0)
+
+    assert state_upper_bounds(tree) == {0: (3, 3), 1: (3, None)}
+    assert is_coverable(tree, 1, Vector2D(3, 100))
+    assert not is_coverable(tree, 1, Vector2D(4, 0))
+
+
+def test_coverability_tree_node_limit():
+    vass = VASS2D({0: State(0, [(0, Vector2D(1, 0)), (0, Vector2D(0, 1))])})
+    tree = build_coverability_tree(vass, 0, Vector2D(0, 0), max_nodes=2, debug=False)
+    assert not tree.complete
+    assert len(tree.states) == 2
+
+
+def test_antichain_keeps_maximal_points():
+    maximal = Antichain()
+    for x, y in [(0, 5), (5, 0), (2, 2), (3, 3)]:
+        assert not maximal.covers(x, y)
+        maximal.add(x, y)
+    assert (maximal.xs, [-y for y in maximal.neg_ys]) == ([0, 3, 5], [5, 3, 0])
+    assert maximal.covers(2, 2) and maximal.covers(0, 4) and not maximal.covers(1, 4)
+    maximal.add(6, 6)
+    assert len(maximal) == 1 and maximal.covers(6, 0)
+
+
+def test_coverability_tree_limit_per_state():
+    # Loops that only move value between the counters never accelerate; the tree gives up early instead
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, -1)), (0, Vector2D(-1, 1)), (1, Vector2D(0, 0))]),
+        1: State(1, []),
+    })
+    tree = build_coverability_tree(vass, 0, Vector2D(10000, 10000), max_nodes_per_state=50, debug=False)
+    assert not tree.complete
+    assert sum(1 for state in tree.states if state == 0) == 50
+
+
+def test_state_bounds_narrow_candidates():
+    loop = Loop(effect=Vector2D(2, -1), guard=(0, 1), cycle=[(1, 1, Vector2D(2, -1))])
+    scheme = LinearPathScheme([Vector2D(0, 0)], [loop, loop], [[]], [], path=[0, 1])
+    limits = loop_iteration_bounds(scheme, {0: (0, 0), 1: (7, None)})
+    assert list(limits) == [3, 3]
+
+    candidates = generate_solution_candidates(np.array([2.0, 2.0]), np.array([[1.0], [-1.0]]), debug=False, upper_bounds=limits)
+    assert sorted(tuple(c) for c in candidates) == [(1.0, 3.0), (2.0, 2.0), (2.0, 2.0), (3.0, 1.0)]
@@ -0,0 +1,34 @@
+import dataclasses
+import pickle
+import pytest
+from src.definition import Vector2D, Loop, State, Transition, Accumulator, intern_vector
+
+
+def test_value_types_are_immutable_and_hashable():
+    vector = Vector2D(1, -2)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        vector.x = 3
+    assert not hasattr(vector, "__dict__")
+    assert len({vector, Vector2D(1, -2), intern_vector(1, -2)}) == 1
+
+    loop = Loop(vector, (0, 2), [(0, 0, vector)])
+    assert loop.cycle == ((0, 0, vector),)
+    assert hash(loop) == hash(Loop(Vector2D(1, -2), (0, 2)))
+
+    state = State(0, [(1, vector)])
+    assert state.transitions == (Transition(1, vector),) and state.transitions[0].target == 1
+    for value in (vector, loop, state):
+        assert pickle.loads(pickle.dumps(value)) == value
+
+
+def test_intern_vector_shares_objects():
+    assert intern_vector(3, 4) is intern_vector(3, 4)
+    assert intern_vector(3, 4) == Vector2D(3, 4)
+
+
+def test_accumulator():
+    position = Accumulator(1, 1)
+    position.add(Vector2D(2, -1)).add(Vector2D(-1, 0), 3)
+    assert (position.x, position.y) == (0, 0) and not position.is_negative()
+    assert position.add(Vector2D(0, -1)).is_negative()
+    assert position.vector() == Vector2D(0, -1)
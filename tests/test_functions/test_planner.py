@@ -0,0 +1,114 @@
+import os
+import random
+from src.definition import Vector2D, VASS2D, State
+from src.coverability import build_coverability_tree
+from src.planner import strongly_connected_components, count_cycles, plan_engine, format_plan, estimate_precheck_nodes
+from src.solver import solve
+from src.utils import find_simple_paths, find_cycles, convert_json_to_vass
+from benchmarks.bench_vectors import layered_config
+from tests.helpers import load_example, schema_verdict
+
+
+def test_strongly_connected_components():
+    vass = VASS2D({
+        0: State(0, [(1, Vector2D(1, 0))]),
+        1: State(1, [(2, Vector2D(0, 1)), (0, Vector2D(-1, 0))]),
+        2: State(2, [(2, Vector2D(1, 1))]),
+    })
+    component = strongly_connected_components(vass, {0, 1, 2})
+    assert component[0] == component[1] != component[2]
+
+
+def test_count_cycles_matches_find_cycles():
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, 0)), (1, Vector2D(0, 1)), (2, Vector2D(1, 1))]),
+        1: State(1, [(0, Vector2D(-1, 0)), (2, Vector2D(0, -1))]),
+        2: State(2, [(0, Vector2D(0, 0)), (3, Vector2D(1, 0))]),
+        3: State(3, []),
+    })
+    component = strongly_connected_components(vass, set(vass.states))
+    for state_id in vass.states:
+        count, exact = count_cycles(vass, state_id, component, random.Random(0))
+        assert exact and count == len(find_cycles(vass, state_id))
+
+
+def test_plan_engine_samples_large_graphs():
+    # complete graph on 9 states: 13700 simple paths from 0 to 8, more than the exact budget
+    vass = VASS2D({s: State(s, [(t, Vector2D(1, -1)) for t in range(9) if t != s]) for s in range(9)})
+    plan = plan_engine(vass, 0, 8, Vector2D(0, 0), Vector2D(1, 1))
+    assert 0.5 * 13700 < plan.estimates["simple_paths"] < 2 * 13700
+    assert plan.engine == 'bfs'
+    assert format_plan(plan).startswith("Engine: bfs")
+
+
+def test_plan_engine_exact_counts():
+    vass, start_state, end_state, start, target = load_example("3.json")
+    plan = plan_engine(vass, start_state, end_state, start, target)
+    assert plan.estimates["simple_paths"] == len(find_simple_paths(vass, start_state, end_state, 100))
+
+
+def test_auto_engine_agrees_with_lps():
+    for name in ["2.json", "3.json", "5.json", "6.json", "7.json", "8.json"]:
+        config, expected = schema_verdict(name)
+        auto = solve(*config, engine='auto')
+        assert auto.reachable == expected, f"Engines disagree on {name}"
+        assert auto.explanation.startswith("Engine:")
+
+
+def test_auto_engine_falls_back_when_box_is_open():
+    # counters grow without bound and the only run to the target leaves the box (3, 3); two loops per state
+    # make the schemas look dearer than searching the small box
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, 0)), (0, Vector2D(2, 0)), (1, Vector2D(0, 0))]),
+        1: State(1, [(1, Vector2D(-1, 1)), (1, Vector2D(-1, 2))]),
+    })
+    result = solve(vass, 0, 1, Vector2D(0, 0), Vector2D(0, 5), engine='auto', bounds=(3, 3))
+    assert result.reachable
+    assert "Fallback" in result.explanation
+
+
+def test_auto_engine_keeps_witness_and_index(tmp_path):
+    # five loops on one state: the planner prefers the bounded search unless a witness or the index is asked for
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, 0)), (0, Vector2D(0, 1)), (0, Vector2D(1, 1)), (0, Vector2D(2, 0)),
+                     (0, Vector2D(2, 1)), (1, Vector2D(0, 0))]),
+        1: State(1, []),
+    })
+    config = (vass, 0, 1, Vector2D(0, 0), Vector2D(3, 2))
+    result = solve(*config, engine='auto')
+    assert result.reachable and result.witness is None
+    assert result.explanation.startswith("Engine: bfs")
+    result = solve(*config, engine='auto', witness=True)
+    assert result.reachable and result.witness
+    assert "only the schemas give" in result.explanation
+
+    index_path = str(tmp_path / "loops.index")
+    result = solve(*config, engine='auto', index_path=index_path, witness=True)
+    assert result.reachable and result.witness
+    assert os.path.isfile(index_path)
+
+
+def test_plan_engine_bfs_estimate_is_calibrated():
+    # the layered benchmark model, on which bfs_search takes a few tenths of a second
+    vass, start_state, end_state, start, target = convert_json_to_vass(layered_config(5, 7))
+    plan = plan_engine(vass, start_state, end_state, start, target, precheck=False)
+    assert 0.1 < plan.estimates["bfs_seconds"] < 10
+
+
+def test_planner_skips_hopeless_precheck():
+    # The loop moves y into x one unit at a time: from (0, 5000) every move is a new maximal node
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, -1)), (1, Vector2D(0, 0))]),
+        1: State(1, []),
+    })
+    assert estimate_precheck_nodes(vass, Vector2D(0, 5000)) == 5001
+    assert not build_coverability_tree(vass, 0, Vector2D(0, 5000), debug=False).complete
+    plan = plan_engine(vass, 0, 1, Vector2D(0, 5000), Vector2D(5000, 0))
+    assert not plan.precheck and "pre-check is skipped" in format_plan(plan)
+
+    small = plan_engine(vass, 0, 1, Vector2D(0, 5), Vector2D(5, 0))
+    assert small.precheck
+    assert not plan_engine(vass, 0, 1, Vector2D(0, 5), Vector2D(5, 0), precheck=False).precheck
+
+    result = solve(vass, 0, 1, Vector2D(0, 5000), Vector2D(4000, 1000), engine='auto')
+    assert result.reachable and "pre-check off" in result.explanation
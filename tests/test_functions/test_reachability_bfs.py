@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from src.definition import Vector2D, VASS2D, State
+from src.reachability_bfs import shift_bitmap, bfs_reachable, default_bounds, empty_bitmaps, MAX_BITMAP_CELLS
+from tests.helpers import load_example, schema_verdict
+
+
+def test_shift_bitmap():
+    bitmap = np.zeros((3, 3), dtype=bool)
+    bitmap[0, 2] = True
+    bitmap[1, 1] = True
+
+    shifted = shift_bitmap(bitmap, 1, -1)
+    assert sorted(zip(*np.nonzero(shifted))) == [(1, 1), (2, 0)]
+
+    # Cells pushed below zero or past the bounds are dropped
+    assert not shift_bitmap(bitmap, -2, 0).any()
+    assert sorted(zip(*np.nonzero(shift_bitmap(bitmap, 0, 1)))) == [(1, 2)]
+    assert not shift_bitmap(bitmap, 5, 0).any()
+
+
+def test_bfs_reachable():
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(2, -1)), (1, Vector2D(0, 1))]),
+        1: State(1, []),
+    })
+    assert bfs_reachable(vass, 0, 1, Vector2D(0, 3), Vector2D(6, 1), (10, 10), False) == (True, 4)
+    assert bfs_reachable(vass, 0, 1, Vector2D(0, 3), Vector2D(5, 1), (10, 10), False) == (False, None)
+    # The run exists but leaves the box
+    assert bfs_reachable(vass, 0, 1, Vector2D(0, 3), Vector2D(6, 1), (5, 10), False) == (False, None)
+
+
+def test_bfs_agrees_with_lps_on_examples():
+    for name in ["1.json", "2.json", "3.json", "5.json", "6.json", "7.json", "8.json"]:
+        (vass, start_state, end_state, start_vector, target_vector), expected = schema_verdict(name)
+        bounds = default_bounds(vass, start_vector, target_vector)
+        reachable, _ = bfs_reachable(vass, start_state, end_state, start_vector, target_vector, bounds, False)
+        assert reachable == expected, f"Engines disagree on {name}"
+
+
+def test_default_box_too_large_is_refused():
+    # Example 4 has counters in the millions; its default box must be refused, not allocated
+    vass, start_state, end_state, start_vector, target_vector = load_example("4.json")
+    bounds = default_bounds(vass, start_vector, target_vector)
+    assert (bounds[0] + 1) * (bounds[1] + 1) > MAX_BITMAP_CELLS
+    with pytest.raises(ValueError):
+        empty_bitmaps(vass, bounds)
+    with pytest.raises(ValueError):
+        bfs_reachable(vass, start_state, end_state, start_vector, target_vector, bounds, False)
@@ -0,0 +1,35 @@
+from src.definition import Vector2D, VASS2D, State
+from src.reachability_bfs import bfs_reachable, default_bounds
+from src.reachability_bidir import reverse_vass, bidirectional_reachable
+from tests.helpers import schema_verdict
+
+
+def test_reverse_vass():
+    vass = VASS2D({
+        0: State(0, [(1, Vector2D(1, -2)), (0, Vector2D(3, 0))]),
+        1: State(1, [(2, Vector2D(0, 1))]),
+    })
+    reversed_vass = reverse_vass(vass)
+    assert reversed_vass.get_transitions(0) == ((0, Vector2D(-3, 0)),)
+    assert reversed_vass.get_transitions(1) == ((0, Vector2D(-1, 2)),)
+    assert reversed_vass.get_transitions(2) == ((1, Vector2D(0, -1)),)
+
+
+def test_bidirectional_reachable():
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(2, -1)), (1, Vector2D(0, 1))]),
+        1: State(1, [(1, Vector2D(-1, 0))]),
+    })
+    reachable, steps = bidirectional_reachable(vass, 0, 1, Vector2D(0, 3), Vector2D(2, 1), (10, 10), False)
+    assert reachable and steps >= 8
+    assert bidirectional_reachable(vass, 0, 1, Vector2D(0, 3), Vector2D(1, 5), (10, 10), False) == (False, None)
+    assert bidirectional_reachable(vass, 0, 0, Vector2D(0, 3), Vector2D(0, 3), (10, 10), False) == (True, 0)
+
+
+def test_bidirectional_agrees_with_other_engines_on_examples():
+    for name in ["1.json", "2.json", "3.json", "5.json", "6.json", "7.json", "8.json"]:
+        (vass, start_state, end_state, start_vector, target_vector), expected = schema_verdict(name)
+        bounds = default_bounds(vass, start_vector, target_vector)
+        reachable, _ = bidirectional_reachable(vass, start_state, end_state, start_vector, target_vector, bounds, False)
+        assert reachable == expected, f"Engines disagree on {name}"
+        assert reachable == bfs_reachable(vass, start_state, end_state, start_vector, target_vector, bounds, False)[0]
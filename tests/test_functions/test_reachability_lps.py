@@ -0,0 +1,44 @@
+import numpy as np
+from scipy import linalg
+from scipy.optimize import nnls
+from src.definition import Vector2D, Loop, LinearPathScheme
+from src.reachabilty_lps import cone_feasible, batch_nnls, batch_null_spaces, batch_solution_spaces, is_reachable
+
+
+def random_systems(seed, n, k):
+    rng = np.random.default_rng(seed)
+    A = rng.integers(-3, 4, (n, 2, k)).astype(float)
+    b = rng.integers(-10, 11, (n, 2)).astype(float)
+    A[::5, 1] = 2 * A[::5, 0]    # some rank-one systems
+    return A, b
+
+
+def test_batch_solvers_match_scipy():
+    for k in range(1, 6):
+        A, b = random_systems(k, 300, k)
+        feasible = cone_feasible(A, b)
+        particular = batch_nnls(A, b)
+        null_spaces = batch_null_spaces(A)
+        for i in range(len(A)):
+            expected, residual = nnls(A[i], b[i])
+            assert np.allclose(particular[i], expected, atol=1e-9)
+            assert feasible[i] == (residual < 1e-9)
+            assert np.array_equal(null_spaces[i], linalg.null_space(A[i]))
+
+
+def test_batch_solution_spaces_drop_infeasible_schemes():
+    up = Loop(Vector2D(1, 0), (0, 0))
+    right = Loop(Vector2D(0, 1), (0, 0))
+    schemes = [
+        LinearPathScheme([], [up, right], [[]], []),
+        LinearPathScheme([], [up], [], []),                     # y can never change
+        LinearPathScheme([Vector2D(1, 1)], [], [], []),         # no loops
+    ]
+    spaces = batch_solution_spaces(Vector2D(0, 0), Vector2D(2, 3), schemes, False)
+    assert np.allclose(spaces[0][0], [2, 3]) and spaces[0][1].shape == (2, 0)
+    assert spaces[1] is None
+    assert spaces[2][0].size == 0
+
+    # is_reachable gives the same answer with or without the precomputed space
+    assert is_reachable(Vector2D(0, 0), Vector2D(2, 3), schemes[0], False, solution_space=spaces[0]) == \
+        is_reachable(Vector2D(0, 0), Vector2D(2, 3), schemes[0], False) == (True, [2, 3])
@@ -0,0 +1,53 @@
+from src.definition import Vector2D, Loop, LinearPathScheme
+from src.schema_trie import build_schema_trie, find_reachable_scheme, count_trie_nodes, trie_candidates
+
+
+def make_scheme(prefix, loops, suffix):
+    return LinearPathScheme(prefix, loops, [[] for _ in loops[1:]], suffix)
+
+
+def test_schemes_share_prefix_nodes():
+    loop = Loop(effect=Vector2D(1, 0), guard=(0, 0))
+    other = Loop(effect=Vector2D(0, 1), guard=(0, 0))
+    schemes = [
+        make_scheme([Vector2D(1, 1)], [loop], [Vector2D(0, 1)]),
+        make_scheme([Vector2D(1, 1)], [loop], [Vector2D(1, 0)]),
+        make_scheme([Vector2D(1, 1)], [other], [Vector2D(1, 0)]),
+        make_scheme([Vector2D(1, 1)], [], []),
+    ]
+    root = build_schema_trie(schemes)
+    # root, shared prefix, two loops, three suffixes
+    assert count_trie_nodes(root) == 7
+    prefix = root.children[('segment', ((1, 1),))]
+    assert prefix.schemes == [schemes[3]]
+
+    scheme, iterations = find_reachable_scheme(Vector2D(0, 0), Vector2D(5, 1), root, False)
+    assert scheme is schemes[1] and iterations == [3]
+    scheme, iterations = find_reachable_scheme(Vector2D(0, 0), Vector2D(0, 5), root, False)
+    assert scheme is None and iterations is None
+
+
+def test_failing_prefix_prunes_subtree(capsys):
+    # Every scheme starts by subtracting 2 from x, which is impossible from (1, 0)
+    drain = Loop(effect=Vector2D(-1, 1), guard=(1, 0))
+    schemes = [make_scheme([Vector2D(-2, 0)], [drain], [Vector2D(0, k)]) for k in range(3)]
+    root = build_schema_trie(schemes)
+
+    scheme, _ = find_reachable_scheme(Vector2D(1, 0), Vector2D(0, 1), root, True)
+    output = capsys.readouterr().out
+    assert scheme is None
+    assert "Pruning subtree" in output and "Testing reachability" not in output
+
+
+def test_position_after_prefix_is_cached(capsys):
+    loop = Loop(effect=Vector2D(1, 0), guard=(0, 0))
+    schemes = [make_scheme([Vector2D(2, 1), Vector2D(-1, 0)], [loop], [Vector2D(0, k)]) for k in range(3)]
+    root = build_schema_trie(schemes)
+
+    # Only the scheme ending with y = 2 is left; it starts simulating from the position after its prefix
+    assert trie_candidates(Vector2D(0, 0), Vector2D(4, 2), root, False) == [(schemes[1], Vector2D(1, 1))]
+
+    scheme, iterations = find_reachable_scheme(Vector2D(0, 0), Vector2D(4, 2), root, True)
+    output = capsys.readouterr().out
+    assert scheme is schemes[1] and iterations == [3]
+    assert "Applying prefix vectors" not in output
@@ -0,0 +1,90 @@
+import numpy as np
+from src.definition import Vector2D, Loop, LinearPathScheme, VASS2D, State
+from src.semilinear import monoid_contains, scheme_linear_sets, build_index, query_index, query_run, save_index, load_index, model_fingerprint
+from src.solver import solve, solve_targets
+from src.witness import build_witness, verify_witness
+
+
+def test_monoid_contains():
+    periods = np.array([[2, 0], [0, 3]])
+    assert monoid_contains(np.array([[4, 9]]), periods)
+    assert not monoid_contains(np.array([[3, 9]]), periods)
+    assert not monoid_contains(np.array([[-2, 0]]), periods)
+
+    # Collinear periods fall back to enumerating one of them
+    periods = np.array([[3, 0], [5, 0]])
+    assert monoid_contains(np.array([[8, 0]]), periods)
+    assert not monoid_contains(np.array([[7, 0]]), periods)
+
+    assert monoid_contains(np.array([[1, 1], [0, 0]]), np.zeros((0, 2), dtype=np.int64))
+
+
+def test_index_queries_and_round_trip(tmp_path):
+    pump = Loop(effect=Vector2D(1, 2), guard=(0, 0), cycle=[(1, 1, Vector2D(1, 2))])
+    drain = Loop(effect=Vector2D(-1, 0), guard=(1, 0), cycle=[(2, 2, Vector2D(-1, 0))])
+    scheme = LinearPathScheme([Vector2D(2, 0)], [pump, drain], [[Vector2D(0, 0)]], [Vector2D(0, 0)], path=[0, 1, 2, 3])
+
+    # Starting from (0, 0) the drain loop can be taken at most 2 + (number of pumps) times
+    index = build_index(Vector2D(0, 0), [scheme], max_iterations=4)
+    assert index.exact == [False]
+    assert query_index(index, Vector2D(2, 0)) == 0
+    assert query_index(index, Vector2D(1000, 1996)) == 0
+    assert query_index(index, Vector2D(0, 0)) == 0
+    assert query_index(index, Vector2D(3, 1)) is None
+
+    path = str(tmp_path / "index.json")
+    save_index(index, path)
+    loaded = load_index(path)
+    assert loaded.start == Vector2D(0, 0) and loaded.exact == [False]
+    assert query_index(loaded, Vector2D(1000, 1996)) == 0
+    assert query_index(loaded, Vector2D(3, 1)) is None
+
+
+def test_index_is_rebuilt_for_another_model(tmp_path):
+    path = str(tmp_path / "index.json")
+    models = [VASS2D({0: State(0, [(0, Vector2D(d, d)), (1, Vector2D(0, 0))]), 1: State(1, [])}) for d in (1, 2)]
+    assert model_fingerprint(models[0], 0, 1, Vector2D(0, 0)) != model_fingerprint(models[1], 0, 1, Vector2D(0, 0))
+    assert model_fingerprint(models[0], 0, 1, Vector2D(0, 0)) != model_fingerprint(models[0], 0, 1, Vector2D(0, 0), max_iterations=5)
+
+    # Same start and number of schemes, but the second model cannot reach (3, 3)
+    assert solve(models[0], 0, 1, Vector2D(0, 0), Vector2D(3, 3), index_path=path).reachable
+    assert not solve(models[1], 0, 1, Vector2D(0, 0), Vector2D(3, 3), index_path=path).reachable
+    assert load_index(path).key == model_fingerprint(models[1], 0, 1, Vector2D(0, 0), state_bounds={0: (None, None), 1: (None, None)})
+
+
+def test_linear_sets_cap_the_runs_per_scheme():
+    # Eight non-pumping loops would need 11^8 runs; the cap keeps it to max_runs and marks the sets inexact
+    loops = [Loop(Vector2D(1, -1), (0, 1)) for _ in range(8)]
+    scheme = LinearPathScheme([], loops, [[]] * 7, [])
+    sets, exact = scheme_linear_sets(Vector2D(0, 100), scheme, max_runs=256)
+    assert not exact
+    assert sum(len(linear_set.bases) for linear_set in sets) <= 256
+    assert any((linear_set.bases == [8, 92]).all(axis=1).any() for linear_set in sets)
+
+
+def test_index_rebuilds_runs_for_witnesses(tmp_path):
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(1, 2)), (1, Vector2D(2, 0))]),
+        1: State(1, [(1, Vector2D(-1, 0)), (2, Vector2D(0, 0))]),
+        2: State(2, []),
+    })
+    path = str(tmp_path / "index.npz")
+    # Building the index on the first query saves it; the later ones only load it
+    first = solve(vass, 0, 2, Vector2D(0, 0), Vector2D(5, 10), index_path=path, witness=True)
+    index = load_index(path)
+    assert first.reachable and first.witness and len(index.schemes) == len(index.sets)
+
+    scheme, iterations = query_run(index, Vector2D(5, 10))
+    assert iterations[0] == 5
+    assert verify_witness(Vector2D(0, 0), Vector2D(5, 10), build_witness(index.schemes[scheme], iterations), 0, 2, False)
+
+    targets = [Vector2D(5, 10), Vector2D(0, 0), Vector2D(7, 3), Vector2D(3, 2), Vector2D(0, 7)]
+    many = solve_targets(vass, 0, 2, Vector2D(0, 0), targets, index_path=path)
+    assert [result.reachable for result in many] == [solve(vass, 0, 2, Vector2D(0, 0), target).reachable for target in targets]
+    assert all(result.witness for result in many if result.reachable)
+
+    # An index file in an older format is rebuilt rather than trusted
+    with open(path, 'w') as file:
+        file.write('{"start": [0, 0], "schemes": []}')
+    assert solve(vass, 0, 2, Vector2D(0, 0), Vector2D(5, 10), index_path=path).reachable
+    assert len(load_index(path).schemes) == len(index.schemes)
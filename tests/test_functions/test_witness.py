@@ -0,0 +1,70 @@
+from src.definition import Vector2D, VASS2D, State, WitnessSegment, Loop, LinearPathScheme
+from src.generate_lps import generate_linear_path_schemas
+from src.reachabilty_lps import simulate_path
+from src.schema_trie import build_schema_trie, find_reachable_scheme
+from src.solver import solve
+from src.witness import build_witness, verify_witness, format_witness, segment_profile
+
+
+def test_build_and_verify_witness():
+    vass = VASS2D({
+        0: State(0, [(1, Vector2D(1, 0))]),
+        1: State(1, [(1, Vector2D(1, 1)), (2, Vector2D(0, -1))]),
+        2: State(2, []),
+    })
+    schemas = generate_linear_path_schemas(vass, 0, 2, 18, 3)
+    assert len(schemas) == 1
+
+    witness = build_witness(schemas[0], [1200000])
+    assert witness == [
+        WitnessSegment([(0, 1, Vector2D(1, 0))], 1),
+        WitnessSegment([(1, 1, Vector2D(1, 1))], 1200000),
+        WitnessSegment([(1, 2, Vector2D(0, -1))], 1),
+    ]
+    assert verify_witness(Vector2D(0, 0), Vector2D(1200001, 1199999), witness, 0, 2, False)
+    assert not verify_witness(Vector2D(0, 0), Vector2D(1200001, 1200000), witness, 0, 2, False)
+    assert "[1 -(1, 1)-> 1] x 1200000" in format_witness(witness)
+
+
+def test_verify_witness_checks_guards_and_connectivity():
+    # The cycle needs one unit of x before each repetition
+    cycle = [(0, 1, Vector2D(-1, 2)), (1, 0, Vector2D(0, -1))]
+    assert segment_profile(cycle) == (Vector2D(-1, 1), (1, 0))
+
+    assert verify_witness(Vector2D(3, 0), Vector2D(0, 3), [WitnessSegment(cycle, 3)], debug=False)
+    assert not verify_witness(Vector2D(3, 0), Vector2D(-1, 4), [WitnessSegment(cycle, 4)], debug=False)
+
+    disconnected = [WitnessSegment([(0, 1, Vector2D(0, 0))]), WitnessSegment([(2, 3, Vector2D(0, 0))])]
+    assert not verify_witness(Vector2D(0, 0), Vector2D(0, 0), disconnected, debug=False)
+
+
+
+def test_decreasing_loop_is_checked_before_every_iteration():
+    # The cycle 1 -> 0 -> 1 needs (1, 2) and takes (-1, -1): from (3, 3) its third round starts at (1, 1)
+    vass = VASS2D({
+        0: State(0, [(1, Vector2D(0, 1)), (0, Vector2D(0, 1)), (0, Vector2D(0, 1))]),
+        1: State(1, [(0, Vector2D(-1, -2)), (0, Vector2D(0, 2))]),
+    })
+    start, target = Vector2D(3, 2), Vector2D(0, 0)
+    loop = Loop(effect=Vector2D(-1, -1), guard=(1, 2))
+    scheme = LinearPathScheme([Vector2D(0, 1)], [loop], [], [])
+    assert simulate_path(start, scheme, [2], False) == (True, Vector2D(1, 1))
+    assert simulate_path(start, scheme, [3], False) == (False, None)
+
+    result = solve(vass, 0, 1, start, target, engine='lps', witness=True)
+    assert not result.reachable and result.witness is None
+    assert not solve(vass, 0, 1, start, target, engine='bfs', bounds=(60, 60)).reachable
+
+
+def test_solver_only_reports_verified_witnesses():
+    vass = VASS2D({
+        0: State(0, [(0, Vector2D(2, -1)), (1, Vector2D(0, 1))]),
+        1: State(1, []),
+    })
+    result = solve(vass, 0, 1, Vector2D(0, 3), Vector2D(6, 1), engine='lps', witness=True)
+    assert result.reachable and result.witness == "[0 -(2, -1)-> 0] x 3\n0 -(0, 1)-> 1"
+
+    # A check that rejects every scheme leaves nothing to report
+    root = build_schema_trie(generate_linear_path_schemas(vass, 0, 1, 8, 2))
+    assert find_reachable_scheme(Vector2D(0, 3), Vector2D(6, 1), root, False)[0] is not None
+    assert find_reachable_scheme(Vector2D(0, 3), Vector2D(6, 1), root, False, None, lambda scheme, iterations: False) == (None, None)